@@ -1,23 +1,69 @@
-﻿from flask import Flask, render_template, request, jsonify, session, redirect, url_for, send_file
+﻿from flask import Flask, render_template, request, jsonify, session, redirect, url_for, send_file, g, make_response
+from flask.json.provider import JSONProvider
 from flask_cors import CORS
+import orjson
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime, timedelta
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import joinedload, selectinload
+from datetime import datetime, date
 import os
 import secrets
+import string
 import hashlib
+import hmac
+import time
 import socket
 from urllib.parse import urlparse, urlunparse
 from io import BytesIO
+from functools import wraps
 from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-from reportlab.lib import colors
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Alignment, Border, Side, NamedStyle
 from reportlab.lib.pagesizes import A4, landscape
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import cm
+from reportlab.pdfgen import canvas
+import calendar
+
+class ORJSONProvider(JSONProvider):
+    """JSON-Serialisierung Ã¼ber orjson (C-Implementierung, serialisiert
+    datetime/date nativ - deutlich schneller als das stdlib json)"""
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
 
 app = Flask(__name__)
-app.secret_key = secrets.token_hex(32)
+app.json = ORJSONProvider(app)
+
+def load_secret_key():
+    """Lade den Session-Key aus der Umgebung oder einer lokalen Datei
+
+    Ein pro Prozessstart erzeugter Key wÃ¼rde bei jedem Deploy/Worker-Neustart
+    alle Sessions invalidieren (unter Gunicorn hat sonst sogar jeder Worker
+    einen eigenen Key).
+    """
+    key = os.environ.get('SECRET_KEY')
+    if key:
+        return key
+    # Lokale Entwicklung: Key einmalig erzeugen und in instance/ ablegen,
+    # damit Sessions einen Neustart Ã¼berleben
+    key_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'secret_key')
+    try:
+        with open(key_file) as f:
+            return f.read().strip()
+    except OSError:
+        pass
+    key = secrets.token_hex(32)
+    try:
+        os.makedirs(os.path.dirname(key_file), exist_ok=True)
+        with open(key_file, 'w') as f:
+            f.write(key)
+    except OSError:
+        print("âš ï¸ Konnte Secret-Key nicht persistieren, Sessions gelten nur fÃ¼r diesen Prozess")
+    return key
+
+app.secret_key = load_secret_key()
 
 # CORS-Konfiguration fÃ¼r React Frontend
 CORS(app, 
@@ -39,10 +85,14 @@ app.config['SQLALCHEMY_DATABASE_URI'] = database_url
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
 # Engine-Optionen fÃ¼r robustere PostgreSQL-Verbindung
-connect_args = {
-    'connect_timeout': 10,
-    'options': '-c statement_timeout=30000'
-}
+# (nur fÃ¼r PostgreSQL - SQLite kennt diese Parameter nicht)
+if database_url.startswith('postgresql://'):
+    connect_args = {
+        'connect_timeout': 10,
+        'options': '-c statement_timeout=30000'
+    }
+else:
+    connect_args = {}
 
 # IPv6 â†’ IPv4 Fix: hostaddr Parameter fÃ¼r psycopg3
 if database_url.startswith('postgresql://'):
@@ -74,6 +124,8 @@ if database_url.startswith('postgresql://'):
         print(f"   DATABASE_URL: {database_url[:50]}...")
 
 app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+    'pool_size': 10,
+    'max_overflow': 20,
     'pool_pre_ping': True,
     'pool_recycle': 300,
     'connect_args': connect_args
@@ -86,16 +138,24 @@ class User(db.Model):
     __tablename__ = 'users'
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), unique=True, nullable=False)
-    email = db.Column(db.String(120), nullable=True)
-    password = db.Column(db.String(64), nullable=False)
+    email = db.Column(db.String(120), nullable=True, index=True)
+    password = db.Column(db.String(256), nullable=False)
     is_admin = db.Column(db.Boolean, default=False)
     force_password_change = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.now)
+    updated_at = db.Column(db.DateTime, default=db.func.now(), onupdate=db.func.now())
     shift_requests = db.relationship('ShiftRequest', backref='user', lazy=True, cascade='all, delete-orphan')
     first_submission_at = db.Column(db.DateTime, nullable=True)  # Zeitpunkt des ersten Speicherns
 
 class ShiftRequest(db.Model):
     __tablename__ = 'shift_requests'
+    __table_args__ = (
+        # Ein Wunsch pro Benutzer und Tag; beschleunigt auÃŸerdem die
+        # user_id+date Abfragen in create_shift_request/get_shift_requests
+        db.Index('ix_shift_requests_user_date', 'user_id', 'date', unique=True),
+        # FÃ¼r die Monatsbereichs-Abfragen des Dashboards (date fÃ¼hrend)
+        db.Index('ix_shift_requests_date_user', 'date', 'user_id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     date = db.Column(db.Date, nullable=False)
@@ -103,8 +163,9 @@ class ShiftRequest(db.Model):
     remarks = db.Column(db.Text, default='')
     status = db.Column(db.String(20), default='PENDING')
     confirmed = db.Column(db.Boolean, default=False)
-    created_at = db.Column(db.DateTime, default=datetime.now)
-    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+    # func.now() stempelt in der Datenbank statt pro Zeile in Python
+    created_at = db.Column(db.DateTime, default=db.func.now())
+    updated_at = db.Column(db.DateTime, default=db.func.now(), onupdate=db.func.now())
     shift_notes = db.relationship('ShiftNote', backref='shift_request', lazy=True, cascade='all, delete-orphan')
 
 class ShiftNote(db.Model):
@@ -128,6 +189,10 @@ class ShiftRequestSnapshot(db.Model):
 
 class Message(db.Model):
     __tablename__ = 'messages'
+    __table_args__ = (
+        # Die Nachrichtenliste sortiert immer nach created_at DESC
+        db.Index('ix_messages_created_at', 'created_at'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     content = db.Column(db.Text, nullable=False)
@@ -137,38 +202,89 @@ class Message(db.Model):
 
 class MessageRead(db.Model):
     __tablename__ = 'message_reads'
+    __table_args__ = (
+        # Jeder Admin liest eine Nachricht nur einmal; deckt den Lookup in mark_message_read ab
+        db.Index('ix_message_reads_msg_admin', 'message_id', 'admin_id', unique=True),
+    )
     id = db.Column(db.Integer, primary_key=True)
     message_id = db.Column(db.Integer, db.ForeignKey('messages.id'), nullable=False)
     admin_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     read_at = db.Column(db.DateTime, default=datetime.now)
     admin = db.relationship('User')
 
-def hash_password(password):
-    """Erstelle einen Hash des Passworts"""
-    return hashlib.sha256(password.encode()).hexdigest()
+def hash_password(password, salt=None):
+    """Erstelle einen scrypt-Hash des Passworts (Format: salt$hash)"""
+    if salt is None:
+        salt = secrets.token_bytes(16)
+    h = hashlib.scrypt(password.encode(), salt=salt, n=2**14, r=8, p=1, dklen=32)
+    return f"{salt.hex()}${h.hex()}"
 
 def verify_password(stored_hash, password):
-    """ÃœberprÃ¼fe ob Passwort korrekt ist"""
-    return stored_hash == hash_password(password)
+    """ÃœberprÃ¼fe ob Passwort korrekt ist (konstante Laufzeit)"""
+    if '$' in stored_hash:
+        salt_hex, _ = stored_hash.split('$', 1)
+        return hmac.compare_digest(stored_hash, hash_password(password, bytes.fromhex(salt_hex)))
+    # Alte Hashes (reines SHA-256) weiterhin akzeptieren, Upgrade erfolgt beim Login
+    return hmac.compare_digest(stored_hash, hashlib.sha256(password.encode()).hexdigest())
+
+def password_needs_rehash(stored_hash):
+    """PrÃ¼fe ob ein gespeicherter Hash noch im alten SHA-256-Format vorliegt"""
+    return '$' not in stored_hash
+
+_dummy_hash = None
+
+def equalize_login_timing():
+    """FÃ¼hre einen Dummy-scrypt aus, damit 'Benutzer unbekannt' nicht schneller antwortet"""
+    global _dummy_hash
+    if _dummy_hash is None:
+        _dummy_hash = hash_password('dummy')
+    verify_password(_dummy_hash, 'nicht-das-passwort')
+
+# Kleiner Cache fÃ¼r bereits verifizierte Logins, damit refresh-freudige
+# Clients nicht bei jedem Request die vollen scrypt-Kosten zahlen.
+# Key ist der gespeicherte Hash plus ein HMAC des Passworts (nie das Passwort selbst).
+_verified_logins = {}
+VERIFIED_LOGINS_MAX = 128
+
+def verify_password_cached(stored_hash, password):
+    """Wie verify_password, aber mit Cache fÃ¼r erfolgreiche Logins"""
+    # Keyed blake2b als MAC: schneller als HMAC-SHA256 bei gleicher Eignung als Cache-Key
+    digest = hashlib.blake2b(password.encode(), key=app.secret_key.encode()[:64],
+                             digest_size=16).hexdigest()
+    key = (stored_hash, digest)
+    if key in _verified_logins:
+        return True
+    ok = verify_password(stored_hash, password)
+    if ok:
+        # Nur Treffer cachen, damit Fehlversuche den Cache nicht fÃ¼llen kÃ¶nnen
+        if len(_verified_logins) >= VERIFIED_LOGINS_MAX:
+            _verified_logins.clear()
+        _verified_logins[key] = True
+    return ok
+
+TEMP_PASSWORD_CHARS = string.ascii_letters + string.digits + "!@#$%"
 
 def generate_temp_password(length=12):
-    """Generiere ein temporÃ¤res Passwort"""
-    import string
-    import random
-    chars = string.ascii_letters + string.digits + "!@#$%"
-    return ''.join(random.choice(chars) for _ in range(length))
+    """Generiere ein temporÃ¤res Passwort (kryptographisch sicher)"""
+    return ''.join(secrets.choice(TEMP_PASSWORD_CHARS) for _ in range(length))
 
 def get_current_user():
-    """Hole den aktuell angemeldeten Benutzer"""
-    user_name = session.get('user_name')
-    if not user_name:
-        return None
-    return User.query.filter_by(name=user_name).first()
+    """Hole den aktuell angemeldeten Benutzer (pro Request gecacht)"""
+    if 'user' in g:
+        return g.user
+    user_id = session.get('user_id')
+    if not user_id:
+        g.user = None
+    else:
+        g.user = db.session.get(User, user_id)
+    return g.user
 
 def is_admin():
-    """PrÃ¼fe ob aktueller Benutzer Admin ist"""
-    user = get_current_user()
-    return user and user.is_admin
+    """PrÃ¼fe ob aktueller Benutzer Admin ist (ohne erneuten DB-Zugriff)"""
+    user = g.get('user')
+    if user is not None:
+        return user.is_admin
+    return bool(session.get('user_id')) and bool(session.get('is_admin'))
 
 def require_login():
     """PrÃ¼fe ob Benutzer angemeldet ist"""
@@ -176,35 +292,132 @@ def require_login():
         return jsonify({'success': False, 'error': 'Nicht angemeldet'}), 401
     return None
 
+def login_required(f):
+    """Decorator: Endpoint nur fÃ¼r angemeldete Benutzer"""
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        auth_error = require_login()
+        if auth_error:
+            return auth_error
+        return f(*args, **kwargs)
+    return wrapper
+
+def make_etag(*parts):
+    """Berechne einen ETag aus den gegebenen Bestandteilen (blake2b, kein Auth-Kontext)"""
+    h = hashlib.blake2b(digest_size=16)
+    for p in parts:
+        h.update(p if isinstance(p, bytes) else str(p).encode())
+    return h.hexdigest()
+
+def admin_required(f):
+    """Decorator: Endpoint nur fÃ¼r angemeldete Admins (ein Lookup pro Request)"""
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        auth_error = require_login()
+        if auth_error:
+            return auth_error
+        if not is_admin():
+            return jsonify({'success': False, 'error': 'Nicht autorisiert'}), 403
+        return f(*args, **kwargs)
+    return wrapper
+
 def migrate_database():
     """FÃ¼hrt Datenbank-Migration durch"""
     from sqlalchemy import text, inspect
-    
+
+    # Schema einmal einlesen statt pro PrÃ¼fung eine frische
+    # information_schema-Abfrage (beschleunigt den Kaltstart)
+    inspector = inspect(db.engine)
+    existing_tables = set(inspector.get_table_names())
+    existing_columns = {
+        table: {col['name']: col for col in inspector.get_columns(table)}
+        for table in existing_tables
+    }
+
     def check_column_exists(table_name, column_name):
-        inspector = inspect(db.engine)
-        columns = [col['name'] for col in inspector.get_columns(table_name)]
-        return column_name in columns
-    
+        return column_name in existing_columns.get(table_name, {})
+
     def check_table_exists(table_name):
-        inspector = inspect(db.engine)
-        return table_name in inspector.get_table_names()
-    
+        return table_name in existing_tables
+
     # Erkenne Datenbanktyp
     is_postgres = 'postgresql' in str(db.engine.url)
     
+    # Jeder Schritt einzeln abgesichert: ein Fehlschlag (z.B. ein Index auf
+    # Altdaten) darf die Ã¼brigen Schritte nicht abbrechen, sonst fehlen dem
+    # ORM am Ende ganze Spalten
+
+    # PrÃ¼fe ob updated_at Spalte existiert
+    # Ohne Default anlegen und backfillen (siehe users.updated_at unten)
     try:
-        # PrÃ¼fe ob updated_at Spalte existiert
         if check_table_exists('shift_requests') and not check_column_exists('shift_requests', 'updated_at'):
             print("   FÃ¼ge updated_at Spalte zu shift_requests hinzu...")
             with db.engine.connect() as conn:
                 conn.execute(text("""
-                    ALTER TABLE shift_requests 
-                    ADD COLUMN updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    ALTER TABLE shift_requests
+                    ADD COLUMN updated_at TIMESTAMP
+                """))
+                conn.execute(text("""
+                    UPDATE shift_requests SET updated_at = CURRENT_TIMESTAMP
                 """))
                 conn.commit()
             print("   âœ“ updated_at Spalte hinzugefÃ¼gt")
-        
-        # PrÃ¼fe ob shift_notes Tabelle existiert
+    except Exception as e:
+        print(f"   Warnung bei Migration (shift_requests.updated_at): {e}")
+
+    # PrÃ¼fe ob first_submission_at Spalte in users existiert
+    try:
+        if check_table_exists('users') and not check_column_exists('users', 'first_submission_at'):
+            print("   FÃ¼ge first_submission_at Spalte zu users hinzu...")
+            with db.engine.connect() as conn:
+                conn.execute(text("""
+                    ALTER TABLE users
+                    ADD COLUMN first_submission_at TIMESTAMP
+                """))
+                conn.commit()
+            print("   âœ“ first_submission_at Spalte hinzugefÃ¼gt")
+    except Exception as e:
+        print(f"   Warnung bei Migration (users.first_submission_at): {e}")
+
+    # PrÃ¼fe ob updated_at Spalte in users existiert (fÃ¼r ETag-Fingerprints)
+    # Ohne Default anlegen und backfillen: SQLite lehnt ADD COLUMN mit
+    # nicht-konstantem Default auf gefÃ¼llten Tabellen ab
+    try:
+        if check_table_exists('users') and not check_column_exists('users', 'updated_at'):
+            print("   FÃ¼ge updated_at Spalte zu users hinzu...")
+            with db.engine.connect() as conn:
+                conn.execute(text("""
+                    ALTER TABLE users
+                    ADD COLUMN updated_at TIMESTAMP
+                """))
+                conn.execute(text("""
+                    UPDATE users SET updated_at = CURRENT_TIMESTAMP
+                """))
+                conn.commit()
+            print("   âœ“ updated_at Spalte zu users hinzugefÃ¼gt")
+    except Exception as e:
+        print(f"   Warnung bei Migration (users.updated_at): {e}")
+
+    # Verbreitere password Spalte fÃ¼r scrypt-Hashes (salt$hash, bis 256 Zeichen).
+    # Nur wenn sie wirklich noch schmaler ist: der ALTER nimmt sonst bei
+    # jedem Worker-Start kurz einen ACCESS-EXCLUSIVE-Lock auf users
+    try:
+        if is_postgres and check_table_exists('users'):
+            pw_col = existing_columns['users'].get('password')
+            pw_length = getattr(pw_col['type'], 'length', None) if pw_col else None
+            if pw_length is not None and pw_length < 256:
+                with db.engine.connect() as conn:
+                    conn.execute(text("""
+                        ALTER TABLE users
+                        ALTER COLUMN password TYPE VARCHAR(256)
+                    """))
+                    conn.commit()
+                print("   âœ“ password Spalte auf VARCHAR(256) verbreitert")
+    except Exception as e:
+        print(f"   Warnung bei Migration (users.password): {e}")
+
+    # PrÃ¼fe ob shift_notes Tabelle existiert
+    try:
         if not check_table_exists('shift_notes'):
             print("   Erstelle shift_notes Tabelle...")
             with db.engine.connect() as conn:
@@ -235,20 +448,13 @@ def migrate_database():
                         )
                     """))
                 conn.commit()
+            existing_tables.add('shift_notes')
             print("   âœ“ shift_notes Tabelle erstellt")
-        
-        # PrÃ¼fe ob first_submission_at Spalte in users existiert
-        if check_table_exists('users') and not check_column_exists('users', 'first_submission_at'):
-            print("   FÃ¼ge first_submission_at Spalte zu users hinzu...")
-            with db.engine.connect() as conn:
-                conn.execute(text("""
-                    ALTER TABLE users 
-                    ADD COLUMN first_submission_at TIMESTAMP
-                """))
-                conn.commit()
-            print("   âœ“ first_submission_at Spalte hinzugefÃ¼gt")
-        
-        # PrÃ¼fe ob shift_request_snapshots Tabelle existiert
+    except Exception as e:
+        print(f"   Warnung bei Migration (shift_notes): {e}")
+
+    # PrÃ¼fe ob shift_request_snapshots Tabelle existiert
+    try:
         if not check_table_exists('shift_request_snapshots'):
             print("   Erstelle shift_request_snapshots Tabelle...")
             with db.engine.connect() as conn:
@@ -275,9 +481,94 @@ def migrate_database():
                         )
                     """))
                 conn.commit()
+            existing_tables.add('shift_request_snapshots')
             print("   âœ“ shift_request_snapshots Tabelle erstellt")
     except Exception as e:
-        print(f"   Warnung bei Migration: {e}")
+        print(f"   Warnung bei Migration (shift_request_snapshots): {e}")
+
+    # Ab hier nur noch Index-DDL: Pflichtspalten und -tabellen stehen
+    # bewusst davor, damit ein fehlschlagender Index keine Spalte
+    # verhindert, ohne die das ORM nicht mehr lesen kann
+
+    # Composite-Index fÃ¼r shift_requests(user_id, date). Der Altbestand
+    # hatte keine Unique-Garantie (Check-then-Insert war racy) â€” vor dem
+    # ersten Anlegen des Index deshalb Duplikate aufrÃ¤umen, der jÃ¼ngste
+    # Wunsch pro (user_id, date) gewinnt
+    try:
+        if check_table_exists('shift_requests'):
+            sr_indexes = {ix['name'] for ix in inspector.get_indexes('shift_requests')}
+            with db.engine.connect() as conn:
+                if 'ix_shift_requests_user_date' not in sr_indexes:
+                    conn.execute(text("""
+                        DELETE FROM shift_requests
+                        WHERE id NOT IN (
+                            SELECT MAX(id) FROM shift_requests
+                            GROUP BY user_id, date
+                        )
+                    """))
+                conn.execute(text("""
+                    CREATE UNIQUE INDEX IF NOT EXISTS ix_shift_requests_user_date
+                    ON shift_requests (user_id, date)
+                """))
+                conn.execute(text("""
+                    CREATE INDEX IF NOT EXISTS ix_shift_requests_date_user
+                    ON shift_requests (date, user_id)
+                """))
+                conn.commit()
+    except Exception as e:
+        print(f"   Warnung bei Migration (shift_requests-Indizes): {e}")
+
+    # Funktionaler Index fÃ¼r den case-insensitiven Login-Lookup.
+    # In AltbestÃ¤nden kÃ¶nnen Namen existieren, die sich nur in
+    # GroÃŸ-/Kleinschreibung unterscheiden (das alte unique=True war
+    # case-sensitiv) â€” dann schlÃ¤gt der Unique-Index fehl, der Login
+    # funktioniert aber auch ohne ihn
+    try:
+        if check_table_exists('users'):
+            with db.engine.connect() as conn:
+                conn.execute(text("""
+                    CREATE UNIQUE INDEX IF NOT EXISTS ix_users_name_lower
+                    ON users (LOWER(name))
+                """))
+                conn.commit()
+    except Exception as e:
+        print(f"   Warnung: ix_users_name_lower nicht erstellt "
+              f"(Namens-Kollisionen in GroÃŸ-/Kleinschreibung?): {e}")
+
+    try:
+        if check_table_exists('users'):
+            with db.engine.connect() as conn:
+                conn.execute(text("""
+                    CREATE INDEX IF NOT EXISTS ix_users_email
+                    ON users (email)
+                """))
+                conn.commit()
+    except Exception as e:
+        print(f"   Warnung bei Migration (ix_users_email): {e}")
+
+    # Index fÃ¼r die created_at-Sortierung der Nachrichtenliste
+    try:
+        if check_table_exists('messages'):
+            with db.engine.connect() as conn:
+                conn.execute(text("""
+                    CREATE INDEX IF NOT EXISTS ix_messages_created_at
+                    ON messages (created_at)
+                """))
+                conn.commit()
+    except Exception as e:
+        print(f"   Warnung bei Migration (ix_messages_created_at): {e}")
+
+    # Composite-Index fÃ¼r message_reads(message_id, admin_id)
+    try:
+        if check_table_exists('message_reads'):
+            with db.engine.connect() as conn:
+                conn.execute(text("""
+                    CREATE UNIQUE INDEX IF NOT EXISTS ix_message_reads_msg_admin
+                    ON message_reads (message_id, admin_id)
+                """))
+                conn.commit()
+    except Exception as e:
+        print(f"   Warnung bei Migration (ix_message_reads_msg_admin): {e}")
 
 def init_db():
     """Initialisiere Datenbank"""
@@ -286,7 +577,8 @@ def init_db():
         # FÃ¼hre Migration durch
         migrate_database()
         # Erstelle Initial-Admin falls keine Benutzer existieren
-        if User.query.count() == 0:
+        # (query(User.id).first() statt count(): kein Scan Ã¼ber die Tabelle)
+        if db.session.query(User.id).first() is None:
             admin = User(
                 name='GroÃŸ',
                 password=hash_password('mettwurst'),
@@ -327,15 +619,23 @@ def login():
         if not password:
             return jsonify({'success': False, 'error': 'Passwort ist erforderlich'}), 400
         
-        user = User.query.filter_by(name=name).first()
-        
+        # Case-insensitiver Lookup Ã¼ber den funktionalen Index ix_users_name_lower
+        user = User.query.filter(db.func.lower(User.name) == db.func.lower(name)).first()
+
         if not user:
+            # Timing angleichen, damit der Fehlerfall nicht verrÃ¤t ob der Name existiert
+            equalize_login_timing()
             return jsonify({'success': False, 'error': 'Benutzer nicht gefunden'}), 401
-        
+
         # Passwort prÃ¼fen
-        if not verify_password(user.password, password):
+        if not verify_password_cached(user.password, password):
             return jsonify({'success': False, 'error': 'Falsches Passwort'}), 401
-        
+
+        # Alte SHA-256-Hashes beim erfolgreichen Login auf scrypt upgraden
+        if password_needs_rehash(user.password):
+            user.password = hash_password(password)
+            db.session.commit()
+
         # PrÃ¼fe ob Passwort geÃ¤ndert werden muss
         if user.force_password_change:
             if not new_password:
@@ -350,8 +650,9 @@ def login():
             user.force_password_change = False
             db.session.commit()
         
-        # Benutzer in Session speichern
-        session['user_name'] = name
+        # Benutzer in Session speichern (ID + Admin-Flag, spart DB-Lookups pro Request)
+        session['user_id'] = user.id
+        session['is_admin'] = user.is_admin
         
         # FÃ¼r normale Formulare: Redirect
         if not request.is_json:
@@ -386,7 +687,7 @@ def register():
             return jsonify({'success': False, 'error': 'PasswÃ¶rter stimmen nicht Ã¼berein'}), 400
         
         # PrÃ¼fe ob Benutzer bereits existiert
-        if User.query.filter_by(name=name).first():
+        if User.query.filter(db.func.lower(User.name) == db.func.lower(name)).first():
             return jsonify({'success': False, 'error': 'Dieser Name ist bereits vergeben'}), 400
         
         # PrÃ¼fe ob E-Mail bereits existiert (falls angegeben)
@@ -403,6 +704,7 @@ def register():
         )
         db.session.add(new_user)
         db.session.commit()
+        invalidate_dashboard_cache()
         
         # FÃ¼r normale Formulare: Redirect zum Login
         if not request.is_json:
@@ -417,23 +719,223 @@ def register():
 @app.route('/logout')
 def logout():
     """Logout"""
-    session.pop('user_name', None)
+    session.pop('user_id', None)
+    session.pop('is_admin', None)
     return redirect(url_for('login'))
 
+# Deutsche Wochentagsnamen als Tuple-Lookup; locale-unabhÃ¤ngig und ohne
+# strftime-Aufruf pro Zeile in den Exporten
+WEEKDAYS_DE = ('Montag', 'Dienstag', 'Mittwoch', 'Donnerstag', 'Freitag', 'Samstag', 'Sonntag')
+WEEKDAYS_DE_KURZ = ('Mo', 'Di', 'Mi', 'Do', 'Fr', 'Sa', 'So')
+
+# Deutsche Monatsnamen (Index 1-12 wie bei calendar.month_name, aber
+# locale-unabhÃ¤ngig und ohne Proxy-Objekt pro Zugriff)
+MONTH_NAMES_DE = ('', 'Januar', 'Februar', 'MÃ¤rz', 'April', 'Mai', 'Juni',
+                  'Juli', 'August', 'September', 'Oktober', 'November', 'Dezember')
+
+# Hintergrundfarben je Schichttyp im PDF-Export (RGB 0..1)
+SHIFT_COLORS = {
+    'T': (0.99, 0.95, 0.78),    # Gelb
+    'T10': (0.86, 0.92, 0.99),  # Blau
+    'N10': (0.88, 0.91, 1.0),   # Indigo
+}
+SHIFT_COLOR_DEFAULT = (0.9, 0.9, 0.9)  # Grau
+
+def format_date_de(d):
+    """Formatiere ein Datum als TT.MM.JJJJ"""
+    return f"{d.day:02d}.{d.month:02d}.{d.year}"
+
+def next_month_range(today=None):
+    """Folgemonat als (Jahr, Monat, Monatsanfang, Monatsende-exklusiv)
+
+    Der halboffene Datumsbereich kann direkt als Index-freundliches
+    Range-Prädikat auf shift_requests.date verwendet werden.
+    """
+    today = today or date.today()
+    if today.month == 12:
+        next_year, next_month = today.year + 1, 1
+    else:
+        next_year, next_month = today.year, today.month + 1
+    month_start = date(next_year, next_month, 1)
+    if next_month == 12:
+        month_end = date(next_year + 1, 1, 1)
+    else:
+        month_end = date(next_year, next_month + 1, 1)
+    return next_year, next_month, month_start, month_end
+
+def serialize_shift_request(req_id, user_name, req_date, shift_type, remarks,
+                            status, confirmed, created_at, updated_at, notes):
+    """Gemeinsame JSON-Darstellung eines Dienstwunschs"""
+    created = created_at.isoformat()
+    return {
+        'id': str(req_id),
+        'user_name': user_name,
+        'date': req_date.isoformat(),
+        'shiftType': shift_type,
+        'remarks': remarks,
+        'status': status,
+        'confirmed': confirmed,
+        'createdAt': created,
+        'updatedAt': updated_at.isoformat() if updated_at else created,
+        'notes': notes
+    }
+
+def serialize_shift_note(note_id, content, user_name, created_at):
+    """Gemeinsame JSON-Darstellung einer Dienst-Notiz"""
+    return {
+        'id': note_id,
+        'content': content,
+        'user_name': user_name,
+        'created_at': created_at.isoformat()
+    }
+
+# Kurzlebiger Cache fÃ¼r die Dashboard-Daten (pro Monat, TTL in Sekunden)
+_dashboard_cache = {}
+DASHBOARD_CACHE_TTL = 30
+
+def invalidate_dashboard_cache():
+    """Leere den Dashboard-Cache nach Ã„nderungen an Benutzern oder WÃ¼nschen"""
+    _dashboard_cache.clear()
+
+def get_dashboard_data(selected_month, selected_year, fingerprint):
+    """Hole Dashboard-Daten aus dem Cache oder baue sie neu auf.
+
+    Gibt zusÃ¤tzlich den Fingerprint zurÃ¼ck, mit dem der Eintrag gebaut
+    wurde: der ETag muss die tatsÃ¤chlich ausgelieferte ReprÃ¤sentation
+    beschreiben, nicht den aktuellen DB-Stand â€” andere Gunicorn-Worker
+    invalidieren unseren prozesslokalen Cache nicht"""
+    key = (selected_year, selected_month)
+    cached = _dashboard_cache.get(key)
+    if cached and cached['expires'] > time.monotonic():
+        return cached['users'], cached['requests'], cached['fingerprint']
+
+    users_data, all_requests = build_dashboard_data(selected_month, selected_year)
+    _dashboard_cache[key] = {
+        'expires': time.monotonic() + DASHBOARD_CACHE_TTL,
+        'users': users_data,
+        'requests': all_requests,
+        'fingerprint': fingerprint
+    }
+    return users_data, all_requests, fingerprint
+
+def build_dashboard_data(selected_month, selected_year):
+    """Baue Benutzer- und Dienstwunsch-Listen fÃ¼r das Admin-Dashboard auf"""
+    # Benutzer samt Wunsch-Anzahl in einer einzigen LEFT-JOIN-Aggregation
+    user_rows = db.session.query(
+        User.id, User.name, User.is_admin, User.created_at,
+        db.func.count(ShiftRequest.id)
+    ).outerjoin(ShiftRequest, ShiftRequest.user_id == User.id
+    ).group_by(User.id).order_by(User.name).all()
+    users_data = [{
+        'id': uid,
+        'name': uname,
+        'is_admin': uis_admin,
+        'created_at': ucreated_at.isoformat(),
+        'shift_count': shift_count
+    } for uid, uname, uis_admin, ucreated_at, shift_count in user_rows]
+    
+    # Lade DienstwÃ¼nsche fÃ¼r ausgewÃ¤hlten Monat
+    all_requests = []
+    
+    # Ermittle welche User tatsÃ¤chlich Ã„nderungen haben: der Mengenvergleich
+    # lÃ¤uft komplett in SQL (symmetrische Differenz via EXCEPT/UNION),
+    # es kommen nur noch die geÃ¤nderten user_ids zurÃ¼ck
+    users_with_modifications = {row[0] for row in db.session.execute(db.text("""
+        SELECT DISTINCT user_id FROM (
+            SELECT user_id FROM (
+                SELECT user_id, date, shift_type FROM shift_request_snapshots
+                WHERE user_id IN (SELECT id FROM users WHERE first_submission_at IS NOT NULL)
+                EXCEPT
+                SELECT user_id, date, shift_type FROM shift_requests
+            ) AS nur_snapshot
+            UNION
+            SELECT user_id FROM (
+                SELECT user_id, date, shift_type FROM shift_requests
+                WHERE user_id IN (SELECT id FROM users WHERE first_submission_at IS NOT NULL)
+                EXCEPT
+                SELECT user_id, date, shift_type FROM shift_request_snapshots
+            ) AS nur_aktuell
+        ) AS diff
+    """))}
+    
+    # Nur die benÃ¶tigten Spalten laden statt kompletter ORM-Objekte;
+    # yield_per streamt die Zeilen in Batches statt alles vorab zu puffern
+    rows = db.session.query(
+        ShiftRequest.id, ShiftRequest.user_id, ShiftRequest.date,
+        ShiftRequest.shift_type, ShiftRequest.remarks, ShiftRequest.status,
+        ShiftRequest.confirmed, ShiftRequest.created_at, ShiftRequest.updated_at,
+        User.name, User.first_submission_at
+    ).join(User, ShiftRequest.user_id == User.id).filter(
+        # Datumsbereich statt extract(): sargable, nutzt den Index auf (date, user_id)
+        ShiftRequest.date >= date(selected_year, selected_month, 1),
+        ShiftRequest.date < (date(selected_year + 1, 1, 1) if selected_month == 12
+                             else date(selected_year, selected_month + 1, 1))
+    ).order_by(ShiftRequest.date).yield_per(200)
+
+    entries_by_id = {}
+    for (req_id, user_id, req_date, shift_type, remarks, status, confirmed,
+         created_at, updated_at, user_name, first_submission_at) in rows:
+        entry = serialize_shift_request(
+            req_id, user_name, req_date, shift_type, remarks, status,
+            confirmed, created_at, updated_at, [])
+        entry['user_id'] = user_id
+        entry['first_submission_at'] = first_submission_at.isoformat() if first_submission_at else None
+        entry['has_modifications'] = user_id in users_with_modifications
+        all_requests.append(entry)
+        entries_by_id[req_id] = entry
+
+    # Notizen fÃ¼r alle DienstwÃ¼nsche des Monats in einer Abfrage laden
+    if entries_by_id:
+        note_rows = db.session.query(
+            ShiftNote.shift_request_id, ShiftNote.id, ShiftNote.content,
+            ShiftNote.created_at, User.name
+        ).join(User, ShiftNote.user_id == User.id).filter(
+            ShiftNote.shift_request_id.in_(entries_by_id)
+        ).order_by(ShiftNote.created_at).all()
+        for sr_id, note_id, content, note_created_at, note_user_name in note_rows:
+            entries_by_id[sr_id]['notes'].append(
+                serialize_shift_note(note_id, content, note_user_name, note_created_at))
+
+    return users_data, all_requests
+
+# Die Monatsliste Ã¤ndert sich nur beim Monatswechsel; einmal pro Monat neu bauen
+_months_cache = {'stamp': None, 'data': None}
+
+def get_available_months():
+    """Liste verfÃ¼gbarer Monate (letzte 12 Monate + nÃ¤chste 3), pro Monat gecacht"""
+    today = date.today()
+    stamp = (today.year, today.month)
+    if _months_cache['stamp'] != stamp:
+        months = []
+        for i in range(-12, 4):
+            # Monat relativ zum aktuellen Monat, ohne timedelta-NÃ¤herung
+            total = today.year * 12 + (today.month - 1) + i
+            year, month = divmod(total, 12)
+            month += 1
+            months.append({
+                'year': year,
+                'month': month,
+                'name': MONTH_NAMES_DE[month],
+                'display': f"{MONTH_NAMES_DE[month]} {year}"
+            })
+        _months_cache['data'] = months
+        _months_cache['stamp'] = stamp
+    return _months_cache['data']
+
 @app.route('/admin')
 def admin_dashboard():
     """Admin-Dashboard mit allen DienstwÃ¼nschen"""
     user = get_current_user()
     if not user:
         return redirect(url_for('login'))
-    
+
     if not user.is_admin:
         return redirect(url_for('index'))
-    
+
     # Monat-Filter aus Query-Parameter
     selected_month = request.args.get('month')
     selected_year = request.args.get('year')
-    
+
     # Standard: Folgemonat
     if not selected_month or not selected_year:
         today = datetime.now()
@@ -446,128 +948,90 @@ def admin_dashboard():
     else:
         selected_month = int(selected_month)
         selected_year = int(selected_year)
-    
-    # Lade alle Benutzer
-    all_users = User.query.order_by(User.name).all()
-    users_data = []
-    for u in all_users:
-        # ZÃ¤hle shift_requests ohne sie komplett zu laden
-        shift_count = ShiftRequest.query.filter_by(user_id=u.id).count()
-        users_data.append({
-            'id': u.id,
-            'name': u.name,
-            'is_admin': u.is_admin,
-            'created_at': u.created_at.isoformat(),
-            'shift_count': shift_count
-        })
-    
-    # Lade DienstwÃ¼nsche fÃ¼r ausgewÃ¤hlten Monat
-    all_requests = []
-    
-    # Ermittle welche User tatsÃ¤chlich Ã„nderungen haben
-    users_with_modifications = set()
-    for user in User.query.filter(User.first_submission_at.isnot(None)).all():
-        # Hole Snapshots und aktuelle Shifts
-        snapshots = ShiftRequestSnapshot.query.filter_by(user_id=user.id).all()
-        current_shifts = ShiftRequest.query.filter_by(user_id=user.id).all()
-        
-        # Erstelle Sets fÃ¼r Vergleich
-        snapshot_set = {(s.date.isoformat(), s.shift_type) for s in snapshots}
-        current_set = {(s.date.isoformat(), s.shift_type) for s in current_shifts}
-        
-        # PrÃ¼fe ob es Unterschiede gibt
-        if snapshot_set != current_set:
-            users_with_modifications.add(user.id)
-    
-    for req in ShiftRequest.query.filter(
-        db.extract('month', ShiftRequest.date) == selected_month,
-        db.extract('year', ShiftRequest.date) == selected_year
-    ).order_by(ShiftRequest.date).all():
-        # Lade Notizen fÃ¼r diesen Dienst
-        notes_data = []
-        for note in req.shift_notes:
-            notes_data.append({
-                'id': note.id,
-                'content': note.content,
-                'user_name': note.user.name,
-                'created_at': note.created_at.isoformat()
-            })
-        
-        all_requests.append({
-            'id': str(req.id),
-            'user_id': req.user_id,
-            'user_name': req.user.name,
-            'date': req.date.isoformat(),
-            'shiftType': req.shift_type,
-            'remarks': req.remarks,
-            'status': req.status,
-            'confirmed': req.confirmed,
-            'createdAt': req.created_at.isoformat(),
-            'updatedAt': req.updated_at.isoformat() if req.updated_at else req.created_at.isoformat(),
-            'first_submission_at': req.user.first_submission_at.isoformat() if req.user.first_submission_at else None,
-            'has_modifications': req.user_id in users_with_modifications,
-            'notes': notes_data
-        })
-    
-    # Generiere Liste verfÃ¼gbarer Monate (letzte 12 Monate + nÃ¤chste 3)
-    import calendar as cal
-    available_months = []
-    today = datetime.now()
-    for i in range(-12, 4):
-        month_date = datetime(today.year, today.month, 1) + timedelta(days=32 * i)
-        month_date = month_date.replace(day=1)
-        available_months.append({
-            'year': month_date.year,
-            'month': month_date.month,
-            'name': cal.month_name[month_date.month],
-            'display': f"{cal.month_name[month_date.month]} {month_date.year}"
-        })
-    
-    return render_template('admin_dashboard_v3.html', 
+
+    # Billiger Fingerprint Ã¼ber alles, was die Seite beeinflusst; bei Treffer 304
+    month_start = date(selected_year, selected_month, 1)
+    month_end = (date(selected_year + 1, 1, 1) if selected_month == 12
+                 else date(selected_year, selected_month + 1, 1))
+    shifts_fp = db.session.query(
+        db.func.count(ShiftRequest.id), db.func.max(ShiftRequest.updated_at)
+    ).filter(ShiftRequest.date >= month_start, ShiftRequest.date < month_end).one()
+    # has_modifications vergleicht Snapshots mit ALLEN WÃ¼nschen, nicht nur
+    # dem gewÃ¤hlten Monat â€” deshalb zusÃ¤tzlich ein globaler Fingerprint
+    all_shifts_fp = db.session.query(
+        db.func.count(ShiftRequest.id), db.func.max(ShiftRequest.updated_at)).one()
+    users_fp = db.session.query(
+        db.func.count(User.id), db.func.max(User.updated_at)).one()
+    notes_fp = db.session.query(
+        db.func.count(ShiftNote.id), db.func.max(ShiftNote.created_at)).one()
+    snapshot_count = db.session.query(db.func.count(ShiftRequestSnapshot.id)).scalar()
+    fingerprint = (*shifts_fp, *all_shifts_fp, *users_fp, *notes_fp, snapshot_count)
+
+    # Erst die Daten holen: kommt der Body aus dem Cache, muss auch der
+    # ETag zum Cache-Eintrag gehÃ¶ren (Cache-Hit ist billig, Cache-Miss
+    # hÃ¤tte die Daten ohnehin gebaut)
+    users_data, all_requests, served_fp = get_dashboard_data(
+        selected_month, selected_year, fingerprint)
+    etag = make_etag('dashboard', user.id, selected_month, selected_year, *served_fp)
+    if request.headers.get('If-None-Match') == etag:
+        return '', 304
+
+    available_months = get_available_months()
+
+    response = make_response(render_template('admin_dashboard_v3.html',
                          requests=all_requests,
                          users=users_data,
                          user_name=user.name,
                          selected_month=selected_month,
                          selected_year=selected_year,
-                         available_months=available_months)
+                         available_months=available_months))
+    response.headers['ETag'] = etag
+    return response
 
 # Admin API Endpoints
 @app.route('/api/admin/users', methods=['GET'])
+@admin_required
 def get_all_users():
     """Hole alle Benutzer (nur Admin)"""
-    auth_error = require_login()
-    if auth_error:
-        return auth_error
-    
-    if not is_admin():
-        return jsonify({'success': False, 'error': 'Nicht autorisiert'}), 403
-    
     try:
-        users = User.query.order_by(User.name).all()
-        users_data = []
-        for u in users:
-            users_data.append({
-                'id': u.id,
-                'name': u.name,
-                'is_admin': u.is_admin,
-                'created_at': u.created_at.isoformat(),
-                'shift_count': len(u.shift_requests)
-            })
-        
-        return jsonify({'success': True, 'data': users_data})
+        # Billiger Fingerprint zuerst: bei unverÃ¤nderten Daten reicht ein 304
+        users_fp = db.session.query(
+            db.func.count(User.id), db.func.max(User.updated_at)).one()
+        shifts_fp = db.session.query(
+            db.func.count(ShiftRequest.id), db.func.max(ShiftRequest.updated_at)).one()
+        etag = make_etag('users', *users_fp, *shifts_fp)
+        if request.headers.get('If-None-Match') == etag:
+            return '', 304
+
+        # Benutzer samt Wunsch-Anzahl in einer einzigen LEFT-JOIN-Aggregation;
+        # optional seitenweise (?limit=&offset=), da die Benutzerliste unbegrenzt wÃ¤chst
+        query = db.session.query(
+            User.id, User.name, User.is_admin, User.created_at,
+            db.func.count(ShiftRequest.id)
+        ).outerjoin(ShiftRequest, ShiftRequest.user_id == User.id
+        ).group_by(User.id).order_by(User.name)
+        limit = request.args.get('limit', type=int)
+        if limit is not None:
+            query = query.limit(limit).offset(request.args.get('offset', 0, type=int))
+        user_rows = query.all()
+        users_data = [{
+            'id': uid,
+            'name': uname,
+            'is_admin': uis_admin,
+            'created_at': ucreated_at.isoformat(),
+            'shift_count': shift_count
+        } for uid, uname, uis_admin, ucreated_at, shift_count in user_rows]
+
+        response = jsonify({'success': True, 'data': users_data})
+        response.headers['ETag'] = etag
+        return response
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/admin/users/<int:user_id>/toggle-admin', methods=['POST'])
+@admin_required
 def toggle_admin(user_id):
     """Admin-Rolle umschalten (nur Admin)"""
-    auth_error = require_login()
-    if auth_error:
-        return auth_error
-    
-    if not is_admin():
-        return jsonify({'success': False, 'error': 'Nicht autorisiert'}), 403
-    
     try:
         user = User.query.get(user_id)
         if not user:
@@ -581,22 +1045,21 @@ def toggle_admin(user_id):
         
         user.is_admin = not user.is_admin
         db.session.commit()
-        
+        invalidate_dashboard_cache()
+
+        # Eigene Session aktuell halten, falls der Admin sich selbst umschaltet
+        if user.id == session.get('user_id'):
+            session['is_admin'] = user.is_admin
+
         return jsonify({'success': True, 'is_admin': user.is_admin})
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/admin/users/<int:user_id>/reset-password', methods=['POST'])
+@admin_required
 def reset_password(user_id):
     """Passwort zurÃ¼cksetzen (nur Admin)"""
-    auth_error = require_login()
-    if auth_error:
-        return auth_error
-    
-    if not is_admin():
-        return jsonify({'success': False, 'error': 'Nicht autorisiert'}), 403
-    
     try:
         user = User.query.get(user_id)
         if not user:
@@ -618,15 +1081,9 @@ def reset_password(user_id):
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/admin/shift-requests/<int:request_id>/confirm', methods=['POST'])
+@admin_required
 def confirm_shift_request(request_id):
     """Dienstwunsch bestÃ¤tigen (nur Admin)"""
-    auth_error = require_login()
-    if auth_error:
-        return auth_error
-    
-    if not is_admin():
-        return jsonify({'success': False, 'error': 'Nicht autorisiert'}), 403
-    
     try:
         shift_request = ShiftRequest.query.get(request_id)
         if not shift_request:
@@ -634,6 +1091,7 @@ def confirm_shift_request(request_id):
         
         shift_request.confirmed = not shift_request.confirmed
         db.session.commit()
+        invalidate_dashboard_cache()
         
         return jsonify({'success': True, 'confirmed': shift_request.confirmed})
     except Exception as e:
@@ -641,40 +1099,32 @@ def confirm_shift_request(request_id):
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/admin/users/<int:user_id>/confirm-all-shifts', methods=['POST'])
+@admin_required
 def confirm_all_user_shifts(user_id):
     """Alle DienstwÃ¼nsche eines Benutzers bestÃ¤tigen (nur Admin)"""
-    auth_error = require_login()
-    if auth_error:
-        return auth_error
-    
-    if not is_admin():
-        return jsonify({'success': False, 'error': 'Nicht autorisiert'}), 403
-    
     try:
         user = User.query.get(user_id)
         if not user:
             return jsonify({'success': False, 'error': 'Benutzer nicht gefunden'}), 404
         
-        # Hole alle unbestÃ¤tigten DienstwÃ¼nsche des Benutzers
-        shifts = ShiftRequest.query.filter_by(user_id=user_id, confirmed=False).all()
-        
-        for shift in shifts:
-            shift.confirmed = True
-        
+        # Ein einzelnes Bulk-UPDATE statt ORM-Objekte laden und pro Zeile schreiben;
+        # updated_at explizit setzen, da onupdate bei Bulk-UPDATEs nicht greift
+        affected = ShiftRequest.query.filter_by(user_id=user_id, confirmed=False).update(
+            {'confirmed': True, 'updated_at': db.func.now()},
+            synchronize_session=False
+        )
         db.session.commit()
-        
-        return jsonify({'success': True, 'confirmed_count': len(shifts)})
+        invalidate_dashboard_cache()
+
+        return jsonify({'success': True, 'confirmed_count': affected})
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/shift-notes', methods=['POST'])
+@login_required
 def create_shift_note():
     """Erstelle Notiz zu einem Dienst"""
-    auth_error = require_login()
-    if auth_error:
-        return auth_error
-    
     try:
         user = get_current_user()
         data = request.json
@@ -693,50 +1143,36 @@ def create_shift_note():
         note = ShiftNote(shift_request_id=shift_id, user_id=user.id, content=content)
         db.session.add(note)
         db.session.commit()
+        invalidate_dashboard_cache()
         
         return jsonify({
             'success': True,
-            'note': {
-                'id': note.id,
-                'content': note.content,
-                'user_name': user.name,
-                'created_at': note.created_at.isoformat()
-            }
+            'note': serialize_shift_note(note.id, note.content, user.name, note.created_at)
         })
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/shift-notes/<int:shift_id>', methods=['GET'])
+@login_required
 def get_shift_notes(shift_id):
     """Hole alle Notizen zu einem Dienst"""
-    auth_error = require_login()
-    if auth_error:
-        return auth_error
-    
     try:
         notes = ShiftNote.query.filter_by(shift_request_id=shift_id).order_by(ShiftNote.created_at).all()
-        
-        notes_data = []
-        for note in notes:
-            notes_data.append({
-                'id': note.id,
-                'content': note.content,
-                'user_name': note.user.name,
-                'created_at': note.created_at.isoformat()
-            })
-        
+
+        notes_data = [
+            serialize_shift_note(note.id, note.content, note.user.name, note.created_at)
+            for note in notes
+        ]
+
         return jsonify({'success': True, 'notes': notes_data})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/messages', methods=['GET', 'POST'])
+@login_required
 def messages():
     """Nachrichten senden und abrufen"""
-    auth_error = require_login()
-    if auth_error:
-        return auth_error
-    
     user = get_current_user()
     
     if request.method == 'POST':
@@ -762,22 +1198,37 @@ def messages():
         if not is_admin():
             return jsonify({'success': False, 'error': 'Nicht autorisiert'}), 403
         
+        # Billiger Fingerprint zuerst: bei unverÃ¤nderten Daten reicht ein 304
+        msgs_fp = db.session.query(
+            db.func.count(Message.id), db.func.max(Message.created_at)).one()
+        reads_fp = db.session.query(
+            db.func.count(MessageRead.id), db.func.max(MessageRead.read_at)).one()
+        etag = make_etag('messages', user.id, *msgs_fp, *reads_fp)
+        if request.headers.get('If-None-Match') == etag:
+            return '', 304
+
         messages_data = []
-        all_messages = Message.query.order_by(Message.created_at.desc()).all()
-        
+        # Autor und Lese-Status samt Admin eager laden statt N+1 Lazy-Selects
+        all_messages = Message.query.options(
+            joinedload(Message.user),
+            selectinload(Message.read_by).joinedload(MessageRead.admin)
+        ).order_by(Message.created_at.desc()).all()
+
         for msg in all_messages:
             # PrÃ¼fe welche Admins diese Nachricht gelesen haben
             read_by_admins = []
+            read_ids = set()
             for read in msg.read_by:
+                read_ids.add(read.admin_id)
                 read_by_admins.append({
                     'admin_id': read.admin_id,
                     'admin_name': read.admin.name,
                     'read_at': read.read_at.isoformat()
                 })
-            
+
             # PrÃ¼fe ob aktueller Admin gelesen hat
-            has_read = any(read.admin_id == user.id for read in msg.read_by)
-            
+            has_read = user.id in read_ids
+
             messages_data.append({
                 'id': msg.id,
                 'user_id': msg.user_id,
@@ -788,18 +1239,14 @@ def messages():
                 'read_by': read_by_admins
             })
         
-        return jsonify({'success': True, 'messages': messages_data})
+        response = jsonify({'success': True, 'messages': messages_data})
+        response.headers['ETag'] = etag
+        return response
 
 @app.route('/api/messages/<int:message_id>/read', methods=['POST'])
+@admin_required
 def mark_message_read(message_id):
     """Nachricht als gelesen markieren"""
-    auth_error = require_login()
-    if auth_error:
-        return auth_error
-    
-    if not is_admin():
-        return jsonify({'success': False, 'error': 'Nicht autorisiert'}), 403
-    
     user = get_current_user()
     
     try:
@@ -823,25 +1270,20 @@ def mark_message_read(message_id):
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/admin/export')
+@admin_required
 def export_shift_requests():
     """Exportiere alle DienstwÃ¼nsche als JSON"""
-    auth_error = require_login()
-    if auth_error:
-        return auth_error
-    
-    if not is_admin():
-        return jsonify({'success': False, 'error': 'Nicht autorisiert'}), 403
-    
     try:
-        # Gruppiere DienstwÃ¼nsche nach Nutzern
-        users = User.query.order_by(User.name).all()
+        # Gruppiere DienstwÃ¼nsche nach Nutzern; Collections per selectinload
+        # vorab laden statt einer Lazy-Abfrage pro Benutzer
+        users = User.query.options(selectinload(User.shift_requests)).order_by(User.name).all()
         export_data = []
         
         for user in users:
             user_requests = []
             for req in user.shift_requests:
                 user_requests.append({
-                    'date': req.date.strftime('%d.%m.%Y'),
+                    'date': format_date_de(req.date),
                     'shift_type': req.shift_type,
                     'remarks': req.remarks,
                     'confirmed': req.confirmed
@@ -857,333 +1299,399 @@ def export_shift_requests():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+def export_fingerprint(export_type):
+    """Fingerprint des Datenbestands: Ã¤ndert sich sobald sich ein Dienstwunsch Ã¤ndert"""
+    max_updated, row_count = db.session.query(
+        db.func.max(ShiftRequest.updated_at), db.func.count(ShiftRequest.id)
+    ).one()
+    if export_type == 'pdf':
+        # Das PDF rendert den Folgemonat relativ zu heute: nach einem
+        # Monatswechsel muss der Cache auch ohne DatenÃ¤nderung kippen
+        next_year, next_month, _, _ = next_month_range()
+        return make_etag(export_type, max_updated, row_count, next_year, next_month)
+    return make_etag(export_type, max_updated, row_count)
+
+def cached_export(export_type, suffix, mimetype, download_name, build):
+    """Liefere den Export von der Platte, solange sich die Daten nicht geÃ¤ndert haben.
+
+    build() erzeugt bei einem Cache-Miss den Export als BytesIO; die Datei wird
+    atomar abgelegt, damit parallele Requests nie eine halbe Datei sehen.
+    """
+    cache_dir = os.path.join(app.instance_path, 'export_cache')
+    os.makedirs(cache_dir, exist_ok=True)
+    etag = export_fingerprint(export_type)
+    path = os.path.join(cache_dir, f"{export_type}-{etag}.{suffix}")
+    if not os.path.exists(path):
+        # Veraltete Versionen desselben Export-Typs aufrÃ¤umen
+        for old in os.listdir(cache_dir):
+            if old.startswith(f"{export_type}-"):
+                try:
+                    os.remove(os.path.join(cache_dir, old))
+                except OSError:
+                    pass
+        output = build()
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(output.getbuffer())
+        os.replace(tmp_path, path)
+    return send_file(path, mimetype=mimetype, as_attachment=True,
+                     download_name=download_name)
+
 @app.route('/api/admin/export/excel')
+@admin_required
 def export_excel():
     """Exportiere DienstwÃ¼nsche als Excel-Datei"""
-    auth_error = require_login()
-    if auth_error:
-        return auth_error
-    
-    if not is_admin():
-        return jsonify({'success': False, 'error': 'Nicht autorisiert'}), 403
-    
     try:
-        # Erstelle Workbook
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "DienstwÃ¼nsche"
-        
-        # Styles
-        header_fill = PatternFill(start_color="C00000", end_color="C00000", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF", size=12)
-        border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
-        
-        # Header
-        headers = ['Mitarbeiter', 'Datum', 'Wochentag', 'Schichtart', 'Bemerkungen', 'Status']
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col, value=header)
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-            cell.border = border
-        
-        # Daten
-        row = 2
-        all_requests = ShiftRequest.query.order_by(ShiftRequest.user_id, ShiftRequest.date).all()
-        
-        for req in all_requests:
-            ws.cell(row=row, column=1, value=req.user.name).border = border
-            ws.cell(row=row, column=2, value=req.date.strftime('%d.%m.%Y')).border = border
-            ws.cell(row=row, column=3, value=req.date.strftime('%A')).border = border
-            ws.cell(row=row, column=4, value=req.shift_type).border = border
-            ws.cell(row=row, column=5, value=req.remarks or '').border = border
-            status_cell = ws.cell(row=row, column=6, value='BestÃ¤tigt' if req.confirmed else 'Offen')
-            status_cell.border = border
-            if req.confirmed:
-                status_cell.fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
-                status_cell.font = Font(color="006100")
-            row += 1
-        
-        # Spaltenbreiten
-        ws.column_dimensions['A'].width = 20
-        ws.column_dimensions['B'].width = 12
-        ws.column_dimensions['C'].width = 15
-        ws.column_dimensions['D'].width = 12
-        ws.column_dimensions['E'].width = 30
-        ws.column_dimensions['F'].width = 12
-        
-        # Speichern in BytesIO
-        output = BytesIO()
-        wb.save(output)
-        output.seek(0)
-        
-        return send_file(
-            output,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            as_attachment=True,
-            download_name=f'DienstwÃ¼nsche_{datetime.now().strftime("%Y%m%d")}.xlsx'
-        )
+        return cached_export(
+            'excel', 'xlsx',
+            'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            f'DienstwÃ¼nsche_{datetime.now().strftime("%Y%m%d")}.xlsx',
+            build_excel_export)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+def build_excel_export():
+    """Baue die Excel-Datei mit allen DienstwÃ¼nschen"""
+    # Erstelle Workbook im write_only-Modus: Zeilen werden inkrementell
+    # geschrieben statt alle Cell-Objekte im Speicher zu halten
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("DienstwÃ¼nsche")
+
+    # Spaltenbreiten mÃ¼ssen im write_only-Modus vor den Zeilen gesetzt werden
+    for col, width in zip('ABCDEF', (20, 12, 15, 12, 30, 12)):
+        ws.column_dimensions[col].width = width
+
+    # Styles
+    header_fill = PatternFill(start_color="C00000", end_color="C00000", fill_type="solid")
+    header_font = Font(bold=True, color="FFFFFF", size=12)
+    border = Border(
+        left=Side(style='thin'),
+        right=Side(style='thin'),
+        top=Side(style='thin'),
+        bottom=Side(style='thin')
+    )
+    confirmed_fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
+    confirmed_font = Font(color="006100")
+
+    # Einmal registrierte NamedStyles: Zuweisung per Name ist nur noch ein
+    # Index-Lookup statt pro Zelle ein Style-Objekt zu kopieren
+    wb.add_named_style(NamedStyle(name='daten', border=border))
+    wb.add_named_style(NamedStyle(
+        name='daten_ok', border=border, fill=confirmed_fill, font=confirmed_font))
+
+    # Header
+    headers = ['Mitarbeiter', 'Datum', 'Wochentag', 'Schichtart', 'Bemerkungen', 'Status']
+    header_row = []
+    for header in headers:
+        cell = WriteOnlyCell(ws, value=header)
+        cell.fill = header_fill
+        cell.font = header_font
+        cell.alignment = Alignment(horizontal='center', vertical='center')
+        cell.border = border
+        header_row.append(cell)
+    ws.append(header_row)
+
+    def data_cell(value, style='daten'):
+        cell = WriteOnlyCell(ws, value=value)
+        cell.style = style
+        return cell
+
+    # Daten in Batches streamen statt alle ORM-Objekte vorab zu laden
+    all_requests = ShiftRequest.query.options(
+        joinedload(ShiftRequest.user)
+    ).order_by(ShiftRequest.user_id, ShiftRequest.date).yield_per(500)
+
+    for req in all_requests:
+        if req.confirmed:
+            status_cell = data_cell('BestÃ¤tigt', style='daten_ok')
+        else:
+            status_cell = data_cell('Offen')
+        ws.append([
+            data_cell(req.user.name),
+            data_cell(format_date_de(req.date)),
+            data_cell(WEEKDAYS_DE[req.date.weekday()]),
+            data_cell(req.shift_type),
+            data_cell(req.remarks or ''),
+            status_cell
+        ])
+
+    # Speichern in BytesIO
+    output = BytesIO()
+    wb.save(output)
+    output.seek(0)
+    return output
+
 @app.route('/api/admin/export/pdf')
+@admin_required
 def export_pdf():
     """Exportiere DienstwÃ¼nsche als PDF-Datei mit Kalender-Layout"""
-    auth_error = require_login()
-    if auth_error:
-        return auth_error
+    try:
+        next_year, next_month, _, _ = next_month_range()
+        return cached_export(
+            'pdf', 'pdf', 'application/pdf',
+            f'Dienstplan_{MONTH_NAMES_DE[next_month]}_{next_year}.pdf',
+            build_pdf_export)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+def build_pdf_export():
+    """Baue das Kalender-PDF fÃ¼r den Folgemonat"""
+    buffer = BytesIO()
     
-    if not is_admin():
-        return jsonify({'success': False, 'error': 'Nicht autorisiert'}), 403
+    # Berechne Folgemonat
+    today = datetime.now()
+    next_year, next_month, month_start, month_end = next_month_range(today.date())
+
+    # Hole alle DienstwÃ¼nsche fÃ¼r Folgemonat: nur die benÃ¶tigten Spalten
+    # samt Benutzername, in Batches gestreamt statt ORM-Objekte + Lazy-Loads
+    all_shifts = db.session.query(
+        ShiftRequest.date, ShiftRequest.shift_type, ShiftRequest.confirmed,
+        User.name
+    ).join(User, ShiftRequest.user_id == User.id).filter(
+        ShiftRequest.date >= month_start,
+        ShiftRequest.date < month_end
+    ).yield_per(500)
+
+    # Flache Lookups pro (Benutzer, Tag) statt verschachtelter Dicts mit
+    # Wrapper-Objekten pro Schicht
+    shift_types = {}
+    shift_conf = {}
+    for shift_date, shift_type, confirmed, user_name in all_shifts:
+        shift_types[(user_name, shift_date.day)] = shift_type
+        shift_conf[(user_name, shift_date.day)] = confirmed
+
+    # Sortiere Benutzer
+    sorted_users = sorted({name for name, _ in shift_types})
     
-    try:
-        from reportlab.pdfgen import canvas
-        from reportlab.lib.pagesizes import A4, landscape
-        from reportlab.lib import colors
-        import calendar
-        
-        buffer = BytesIO()
-        
-        # Berechne Folgemonat
-        today = datetime.now()
-        if today.month == 12:
-            next_month = 1
-            next_year = today.year + 1
-        else:
-            next_month = today.month + 1
-            next_year = today.year
-        
-        # Hole alle DienstwÃ¼nsche fÃ¼r Folgemonat
-        all_shifts = ShiftRequest.query.filter(
-            db.extract('month', ShiftRequest.date) == next_month,
-            db.extract('year', ShiftRequest.date) == next_year
-        ).all()
-        
-        # Gruppiere nach Benutzer und Datum
-        user_shifts = {}
-        for shift in all_shifts:
-            if shift.user.name not in user_shifts:
-                user_shifts[shift.user.name] = {}
-            day = shift.date.day
-            user_shifts[shift.user.name][day] = {
-                'type': shift.shift_type,
-                'confirmed': shift.confirmed
-            }
-        
-        # Sortiere Benutzer
-        sorted_users = sorted(user_shifts.keys())
-        
-        # Erstelle PDF
-        c = canvas.Canvas(buffer, pagesize=landscape(A4))
-        width, height = landscape(A4)
-        
-        # Titel
-        month_name = calendar.month_name[next_month]
-        c.setFont("Helvetica-Bold", 16)
-        c.setFillColorRGB(0.75, 0, 0)  # DRK Rot
-        c.drawCentredString(width/2, height - 40, f"Dienstplan {month_name} {next_year}")
-        
-        # Untertitel
-        c.setFont("Helvetica", 10)
+    # Erstelle PDF
+    # pageCompression komprimiert die Content-Streams (deutlich kleinere Datei,
+    # einmalige zlib-Kosten nur beim Neu-Bauen des Cache-Eintrags)
+    c = canvas.Canvas(buffer, pagesize=landscape(A4), pageCompression=1)
+    width, height = landscape(A4)
+    
+    # Titel
+    month_name = MONTH_NAMES_DE[next_month]
+    c.setFont("Helvetica-Bold", 16)
+    c.setFillColorRGB(0.75, 0, 0)  # DRK Rot
+    c.drawCentredString(width/2, height - 40, f"Dienstplan {month_name} {next_year}")
+    
+    # Untertitel
+    c.setFont("Helvetica", 10)
+    c.setFillColorRGB(0, 0, 0)
+    c.drawCentredString(width/2, height - 60, f"Erstellt am {today.strftime('%d.%m.%Y %H:%M')}")
+    
+    # Kalender-Tabelle
+    days_in_month = calendar.monthrange(next_year, next_month)[1]
+    
+    # Spaltenbreiten
+    name_col_width = 100
+    day_col_width = (width - 80 - name_col_width) / days_in_month
+    
+    # Startposition
+    x_start = 40
+    y_start = height - 100
+    row_height = 25
+
+    # Spalten-Koordinaten und Wochentags-Labels einmal vorberechnen statt
+    # pro Benutzerzeile neu (O(Tage) statt O(Benutzer * Tage))
+    day_xs = [x_start + name_col_width + (d - 1) * day_col_width
+              for d in range(1, days_in_month + 1)]
+    day_centers = [x + day_col_width / 2 for x in day_xs]
+    day_labels = [WEEKDAYS_DE_KURZ[date(next_year, next_month, d).weekday()]
+                  for d in range(1, days_in_month + 1)]
+
+    # Header mit Tagesnummern
+    c.setFont("Helvetica-Bold", 8)
+    for day, center in enumerate(day_centers, start=1):
+        c.drawCentredString(center, y_start, str(day))
+
+    # Wochentage unter den Tagesnummern
+    c.setFont("Helvetica", 6)
+    for center, label in zip(day_centers, day_labels):
+        c.drawCentredString(center, y_start - 10, label)
+    
+    # Mitarbeiter-Zeilen: Zeichenbefehle pro Seite bÃ¼ndeln, damit Farbe und
+    # Font nicht pro Zelle gewechselt werden (weniger PDF-Operatoren)
+    y_pos = y_start - 30
+    names = []           # (y, Name)
+    fills_by_type = {}   # Schichttyp -> [(x, y)]
+    texts = []           # (center, y, Schichttyp)
+    checks = []          # (center, y)
+    borders = []         # (x, y)
+
+    def flush_page_cells():
+        """Zeichne die gesammelten Zellen der aktuellen Seite in PÃ¤ssen"""
+        # Ein saveState/restoreState-Paar pro Seite: die PÃ¤sse setzen Farbe
+        # und Font je einmal, ohne den Zustand fÃ¼r Header/Legende zu verÃ¤ndern
+        c.saveState()
+
+        # HintergrÃ¼nde: ein Farbwechsel pro Schichttyp
+        for s_type, cells in fills_by_type.items():
+            c.setFillColorRGB(*SHIFT_COLORS.get(s_type, SHIFT_COLOR_DEFAULT))
+            for cell_x, cell_y in cells:
+                c.rect(cell_x, cell_y, day_col_width, row_height, fill=1, stroke=0)
+
+        # Rahmen in einem Durchgang
+        c.setStrokeColorRGB(0.7, 0.7, 0.7)
+        c.setLineWidth(0.5)
+        for cell_x, cell_y in borders:
+            c.rect(cell_x, cell_y, day_col_width, row_height, fill=0, stroke=1)
+
+        # Namen und Schichttexte
         c.setFillColorRGB(0, 0, 0)
-        c.drawCentredString(width/2, height - 60, f"Erstellt am {today.strftime('%d.%m.%Y %H:%M')}")
-        
-        # Kalender-Tabelle
-        days_in_month = calendar.monthrange(next_year, next_month)[1]
-        
-        # Spaltenbreiten
-        name_col_width = 100
-        day_col_width = (width - 80 - name_col_width) / days_in_month
-        
-        # Startposition
-        x_start = 40
-        y_start = height - 100
-        row_height = 25
-        
-        # Header mit Tagesnummern
-        c.setFont("Helvetica-Bold", 8)
-        for day in range(1, days_in_month + 1):
-            x = x_start + name_col_width + (day - 1) * day_col_width
-            c.drawCentredString(x + day_col_width/2, y_start, str(day))
-        
-        # Wochentage unter den Tagesnummern
-        c.setFont("Helvetica", 6)
-        for day in range(1, days_in_month + 1):
-            date_obj = datetime(next_year, next_month, day)
-            weekday = ['Mo', 'Di', 'Mi', 'Do', 'Fr', 'Sa', 'So'][date_obj.weekday()]
-            x = x_start + name_col_width + (day - 1) * day_col_width
-            c.drawCentredString(x + day_col_width/2, y_start - 10, weekday)
-        
-        # Mitarbeiter-Zeilen
-        y_pos = y_start - 30
         c.setFont("Helvetica", 9)
-        
-        for user_name in sorted_users:
-            # Name
-            c.drawString(x_start, y_pos, user_name)
-            
-            # Schichten fÃ¼r jeden Tag
-            for day in range(1, days_in_month + 1):
-                x = x_start + name_col_width + (day - 1) * day_col_width
-                
-                if day in user_shifts[user_name]:
-                    shift_info = user_shifts[user_name][day]
-                    shift_type = shift_info['type']
-                    
-                    # Hintergrundfarbe je nach Schichttyp
-                    if shift_type == 'T':
-                        c.setFillColorRGB(0.99, 0.95, 0.78)  # Gelb
-                    elif shift_type == 'T10':
-                        c.setFillColorRGB(0.86, 0.92, 0.99)  # Blau
-                    elif shift_type == 'N10':
-                        c.setFillColorRGB(0.88, 0.91, 1.0)  # Indigo
-                    else:
-                        c.setFillColorRGB(0.9, 0.9, 0.9)  # Grau
-                    
-                    c.rect(x, y_pos - 5, day_col_width, row_height, fill=1, stroke=0)
-                    
-                    # Text
-                    c.setFillColorRGB(0, 0, 0)
-                    c.setFont("Helvetica-Bold", 7)
-                    c.drawCentredString(x + day_col_width/2, y_pos + 5, shift_type)
-                    
-                    # BestÃ¤tigt-Marker
-                    if shift_info['confirmed']:
-                        c.setFont("Helvetica", 6)
-                        c.setFillColorRGB(0, 0.5, 0)
-                        c.drawCentredString(x + day_col_width/2, y_pos - 2, 'âœ“')
-                
-                # Rahmen
-                c.setStrokeColorRGB(0.7, 0.7, 0.7)
-                c.setLineWidth(0.5)
-                c.rect(x, y_pos - 5, day_col_width, row_height, fill=0, stroke=1)
-            
-            y_pos -= row_height
-            
-            # Neue Seite wenn nÃ¶tig
-            if y_pos < 100:
-                c.showPage()
-                y_pos = height - 100
-                
-                # Header wiederholen
-                c.setFont("Helvetica-Bold", 8)
-                for day in range(1, days_in_month + 1):
-                    x = x_start + name_col_width + (day - 1) * day_col_width
-                    c.drawCentredString(x + day_col_width/2, y_pos + 30, str(day))
-                
-                c.setFont("Helvetica", 6)
-                for day in range(1, days_in_month + 1):
-                    date_obj = datetime(next_year, next_month, day)
-                    weekday = ['Mo', 'Di', 'Mi', 'Do', 'Fr', 'Sa', 'So'][date_obj.weekday()]
-                    x = x_start + name_col_width + (day - 1) * day_col_width
-                    c.drawCentredString(x + day_col_width/2, y_pos + 20, weekday)
-        
-        # Legende
-        y_legend = 60
-        c.setFont("Helvetica-Bold", 10)
-        c.drawString(x_start, y_legend, "Legende:")
-        
-        c.setFont("Helvetica", 8)
-        c.setFillColorRGB(0.99, 0.95, 0.78)
-        c.rect(x_start + 60, y_legend - 5, 20, 12, fill=1, stroke=1)
-        c.setFillColorRGB(0, 0, 0)
-        c.drawString(x_start + 85, y_legend, "T = Tagdienst")
-        
-        c.setFillColorRGB(0.86, 0.92, 0.99)
-        c.rect(x_start + 170, y_legend - 5, 20, 12, fill=1, stroke=1)
-        c.setFillColorRGB(0, 0, 0)
-        c.drawString(x_start + 195, y_legend, "T10 = Tagdienst 10h")
-        
-        c.setFillColorRGB(0.88, 0.91, 1.0)
-        c.rect(x_start + 300, y_legend - 5, 20, 12, fill=1, stroke=1)
-        c.setFillColorRGB(0, 0, 0)
-        c.drawString(x_start + 325, y_legend, "N10 = Nachtdienst 10h")
-        
+        for name_y, name in names:
+            c.drawString(x_start, name_y, name)
+        c.setFont("Helvetica-Bold", 7)
+        for center, text_y, s_type in texts:
+            c.drawCentredString(center, text_y, s_type)
+
+        # BestÃ¤tigt-Marker
+        c.setFont("Helvetica", 6)
         c.setFillColorRGB(0, 0.5, 0)
-        c.drawString(x_start + 450, y_legend, "âœ“ = BestÃ¤tigt")
-        
-        # FuÃŸzeile
-        c.setFont("Helvetica", 8)
-        c.setFillColorRGB(0.5, 0.5, 0.5)
-        c.drawCentredString(width/2, 30, "ðŸ¥ DRK KÃ¶ln - Erste-Hilfe-Station Flughafen")
-        
-        c.save()
-        buffer.seek(0)
-        
-        return send_file(
-            buffer,
-            mimetype='application/pdf',
-            as_attachment=True,
-            download_name=f'Dienstplan_{month_name}_{next_year}.pdf'
-        )
-    except Exception as e:
-        return jsonify({'success': False, 'error': str(e)}), 500
+        for center, check_y in checks:
+            c.drawCentredString(center, check_y, 'âœ“')
+
+        c.restoreState()
+
+        names.clear()
+        fills_by_type.clear()
+        texts.clear()
+        checks.clear()
+        borders.clear()
+
+    for user_name in sorted_users:
+        names.append((y_pos, user_name))
+
+        # Schichten fÃ¼r jeden Tag
+        for day in range(1, days_in_month + 1):
+            x = day_xs[day - 1]
+
+            shift_type = shift_types.get((user_name, day))
+            if shift_type is not None:
+                fills_by_type.setdefault(shift_type, []).append((x, y_pos - 5))
+                texts.append((day_centers[day - 1], y_pos + 5, shift_type))
+                if shift_conf[(user_name, day)]:
+                    checks.append((day_centers[day - 1], y_pos - 2))
+
+            borders.append((x, y_pos - 5))
+
+        y_pos -= row_height
+
+        # Neue Seite wenn nÃ¶tig
+        if y_pos < 100:
+            flush_page_cells()
+            c.showPage()
+            y_pos = height - 100
+
+            # Header wiederholen
+            c.setFont("Helvetica-Bold", 8)
+            for day, center in enumerate(day_centers, start=1):
+                c.drawCentredString(center, y_pos + 30, str(day))
+
+            c.setFont("Helvetica", 6)
+            for center, label in zip(day_centers, day_labels):
+                c.drawCentredString(center, y_pos + 20, label)
+
+    flush_page_cells()
+    
+    # Legende
+    y_legend = 60
+    c.setFont("Helvetica-Bold", 10)
+    c.drawString(x_start, y_legend, "Legende:")
+    
+    c.setFont("Helvetica", 8)
+    c.setFillColorRGB(0.99, 0.95, 0.78)
+    c.rect(x_start + 60, y_legend - 5, 20, 12, fill=1, stroke=1)
+    c.setFillColorRGB(0, 0, 0)
+    c.drawString(x_start + 85, y_legend, "T = Tagdienst")
+    
+    c.setFillColorRGB(0.86, 0.92, 0.99)
+    c.rect(x_start + 170, y_legend - 5, 20, 12, fill=1, stroke=1)
+    c.setFillColorRGB(0, 0, 0)
+    c.drawString(x_start + 195, y_legend, "T10 = Tagdienst 10h")
+    
+    c.setFillColorRGB(0.88, 0.91, 1.0)
+    c.rect(x_start + 300, y_legend - 5, 20, 12, fill=1, stroke=1)
+    c.setFillColorRGB(0, 0, 0)
+    c.drawString(x_start + 325, y_legend, "N10 = Nachtdienst 10h")
+    
+    c.setFillColorRGB(0, 0.5, 0)
+    c.drawString(x_start + 450, y_legend, "âœ“ = BestÃ¤tigt")
+    
+    # FuÃŸzeile
+    c.setFont("Helvetica", 8)
+    c.setFillColorRGB(0.5, 0.5, 0.5)
+    c.drawCentredString(width/2, 30, "ðŸ¥ DRK KÃ¶ln - Erste-Hilfe-Station Flughafen")
+    
+    c.save()
+    buffer.seek(0)
+    return buffer
 
 @app.route('/api/shift-requests', methods=['GET'])
+@login_required
 def get_shift_requests():
     """Hole alle DienstwÃ¼nsche des Benutzers fÃ¼r den Folgemonat"""
-    auth_error = require_login()
-    if auth_error:
-        return auth_error
-    
     try:
         user = get_current_user()
-        # Berechne Folgemonat
-        today = datetime.now()
-        if today.month == 12:
-            next_month = 1
-            next_year = today.year + 1
-        else:
-            next_month = today.month + 1
-            next_year = today.year
-        
-        # Filtere nach Benutzer und Folgemonat
-        requests = ShiftRequest.query.filter_by(user_id=user.id).filter(
-            db.extract('month', ShiftRequest.date) == next_month,
-            db.extract('year', ShiftRequest.date) == next_year
+        # Folgemonat als Datumsbereich; der halboffene Bereich nutzt den
+        # Index auf (user_id, date) statt extract() pro Zeile
+        _, _, month_start, month_end = next_month_range()
+
+        # Billiger Fingerprint zuerst: bei unverÃ¤nderten Daten reicht ein 304
+        shifts_fp = db.session.query(
+            db.func.count(ShiftRequest.id), db.func.max(ShiftRequest.updated_at)
+        ).filter(ShiftRequest.user_id == user.id).one()
+        notes_fp = db.session.query(
+            db.func.count(ShiftNote.id), db.func.max(ShiftNote.created_at)).one()
+        # month_start gehÃ¶rt in den ETag: beim Monatswechsel liefert der
+        # Endpoint ein anderes Fenster, auch wenn sich keine Daten Ã¤ndern
+        etag = make_etag('shift-requests', user.id, month_start, *shifts_fp, *notes_fp)
+        if request.headers.get('If-None-Match') == etag:
+            return '', 304
+
+        rows = db.session.query(
+            ShiftRequest.id, ShiftRequest.date, ShiftRequest.shift_type,
+            ShiftRequest.remarks, ShiftRequest.status, ShiftRequest.confirmed,
+            ShiftRequest.created_at, ShiftRequest.updated_at
+        ).filter(
+            ShiftRequest.user_id == user.id,
+            ShiftRequest.date >= month_start,
+            ShiftRequest.date < month_end
         ).order_by(ShiftRequest.date).all()
-        
-        filtered = []
-        for req in requests:
-            # Lade Notizen fÃ¼r diesen Dienst
-            notes_data = []
-            for note in req.shift_notes:
-                notes_data.append({
-                    'id': note.id,
-                    'content': note.content,
-                    'user_name': note.user.name,
-                    'created_at': note.created_at.isoformat()
-                })
-            
-            filtered.append({
-                'id': str(req.id),
-                'user_name': user.name,
-                'date': req.date.isoformat(),
-                'shiftType': req.shift_type,
-                'remarks': req.remarks,
-                'status': req.status,
-                'confirmed': req.confirmed,
-                'createdAt': req.created_at.isoformat(),
-                'updatedAt': req.updated_at.isoformat() if req.updated_at else req.created_at.isoformat(),
-                'notes': notes_data
-            })
-        
-        return jsonify({'success': True, 'data': filtered})
+
+        # Notizen fÃ¼r alle WÃ¼nsche in einer Abfrage statt Lazy-Load pro Wunsch
+        notes_by_request = {}
+        request_ids = [row.id for row in rows]
+        if request_ids:
+            note_rows = db.session.query(
+                ShiftNote.shift_request_id, ShiftNote.id, ShiftNote.content,
+                ShiftNote.created_at, User.name
+            ).join(User, ShiftNote.user_id == User.id).filter(
+                ShiftNote.shift_request_id.in_(request_ids)
+            ).order_by(ShiftNote.created_at).all()
+            for sr_id, note_id, content, note_created_at, note_user_name in note_rows:
+                notes_by_request.setdefault(sr_id, []).append(
+                    serialize_shift_note(note_id, content, note_user_name, note_created_at))
+
+        filtered = [
+            serialize_shift_request(
+                req_id, user.name, req_date, shift_type, remarks, status,
+                confirmed, created_at, updated_at, notes_by_request.get(req_id, []))
+            for (req_id, req_date, shift_type, remarks, status, confirmed,
+                 created_at, updated_at) in rows
+        ]
+
+        response = jsonify({'success': True, 'data': filtered})
+        response.headers['ETag'] = etag
+        return response
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/shift-requests', methods=['POST'])
+@login_required
 def create_shift_request():
     """Erstelle einen neuen Dienstwunsch"""
-    auth_error = require_login()
-    if auth_error:
-        return auth_error
-    
     try:
         user = get_current_user()
         data = request.json
@@ -1196,48 +1704,48 @@ def create_shift_request():
             return jsonify({'success': False, 'error': 'Schichtart ist erforderlich'}), 400
         
         # PrÃ¼fe ob Datum in der Vergangenheit liegt
-        request_date = datetime.fromisoformat(data['date'])
-        if request_date.date() < datetime.now().date():
-            return jsonify({
-                'success': False, 
-                'error': 'Das Datum darf nicht in der Vergangenheit liegen'
-            }), 400
-        
-        # PrÃ¼fe ob bereits ein Wunsch fÃ¼r diesen Tag und Benutzer existiert
-        existing = ShiftRequest.query.filter_by(
-            user_id=user.id,
-            date=request_date.date()
-        ).first()
-        
-        if existing:
+        request_date = date.fromisoformat(data['date'])
+        if request_date < date.today():
             return jsonify({
                 'success': False,
-                'error': 'Sie haben bereits einen Wunsch fÃ¼r dieses Datum eingereicht'
+                'error': 'Das Datum darf nicht in der Vergangenheit liegen'
             }), 400
-        
-        # Erstelle neuen Wunsch
-        new_request = ShiftRequest(
+
+        # Erstelle neuen Wunsch atomar: der Unique-Index auf (user_id, date)
+        # erkennt Duplikate serverseitig in einem einzigen Roundtrip
+        insert_stmt = pg_insert if db.engine.dialect.name == 'postgresql' else sqlite_insert
+        stmt = insert_stmt(ShiftRequest).values(
             user_id=user.id,
-            date=request_date.date(),
+            date=request_date,
             shift_type=data['shiftType'],
             remarks=data.get('remarks', ''),
             status='PENDING'
-        )
-        
-        db.session.add(new_request)
+        ).on_conflict_do_nothing(
+            index_elements=['user_id', 'date']
+        ).returning(ShiftRequest.id, ShiftRequest.confirmed, ShiftRequest.created_at)
+
+        row = db.session.execute(stmt).first()
         db.session.commit()
-        
+
+        if row is None:
+            return jsonify({
+                'success': False,
+                'error': 'Sie haben bereits einen Wunsch fÃ¼r dieses Datum eingereicht'
+            }), 400
+
+        invalidate_dashboard_cache()
+
         return jsonify({
-            'success': True, 
+            'success': True,
             'data': {
-                'id': str(new_request.id),
+                'id': str(row.id),
                 'user_name': user.name,
-                'date': new_request.date.isoformat(),
-                'shiftType': new_request.shift_type,
-                'remarks': new_request.remarks,
-                'status': new_request.status,
-                'confirmed': new_request.confirmed,
-                'createdAt': new_request.created_at.isoformat()
+                'date': request_date.isoformat(),
+                'shiftType': data['shiftType'],
+                'remarks': data.get('remarks', ''),
+                'status': 'PENDING',
+                'confirmed': row.confirmed,
+                'createdAt': row.created_at.isoformat()
             }
         })
     
@@ -1246,15 +1754,9 @@ def create_shift_request():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/admin/users/<int:user_id>/snapshots', methods=['GET'])
+@admin_required
 def get_user_snapshots(user_id):
     """Hole ursprÃ¼ngliche DienstwÃ¼nsche eines Benutzers (nur Admin)"""
-    auth_error = require_login()
-    if auth_error:
-        return auth_error
-    
-    if not is_admin():
-        return jsonify({'success': False, 'error': 'Nicht autorisiert'}), 403
-    
     try:
         user = User.query.get(user_id)
         if not user:
@@ -1280,74 +1782,82 @@ def get_user_snapshots(user_id):
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/shift-requests/batch', methods=['POST'])
+@login_required
 def save_shifts_batch():
     """Speichere mehrere DienstwÃ¼nsche gleichzeitig mit Ã„nderungsverfolgung"""
-    auth_error = require_login()
-    if auth_error:
-        return auth_error
-    
     try:
         user = get_current_user()
         data = request.json
         shifts = data.get('shifts', {})  # Dict: {date: shiftType}
+
+        # Jeden Datums-String genau einmal parsen statt pro Schleife erneut
+        parsed_dates = {date_str: date.fromisoformat(date_str) for date_str in shifts}
         
         # PrÃ¼fe ob User bereits einmal gespeichert hat
         is_first_submission = user.first_submission_at is None
         has_changes = False
-        
+
+        # Alle bestehenden WÃ¼nsche des Users in einem Roundtrip laden;
+        # daraus speisen sich Ã„nderungserkennung und BestÃ¤tigt-Check
+        existing_rows = db.session.query(
+            ShiftRequest.date, ShiftRequest.shift_type, ShiftRequest.confirmed
+        ).filter_by(user_id=user.id).all()
+        existing_shifts = {sr_date.isoformat(): sr_type for sr_date, sr_type, _ in existing_rows}
+        confirmed_dates = {sr_date.isoformat() for sr_date, _, sr_conf in existing_rows if sr_conf}
+
         if not is_first_submission:
-            # PrÃ¼fe ob es Ã„nderungen gibt (neue Dienste oder geÃ¤nderte Dienste)
-            existing_shifts = {sr.date.isoformat(): sr.shift_type for sr in ShiftRequest.query.filter_by(user_id=user.id).all()}
-            
-            for date_str, shift_type in shifts.items():
-                if date_str not in existing_shifts or existing_shifts[date_str] != shift_type:
-                    has_changes = True
-                    break
-            
-            # PrÃ¼fe auch ob Dienste entfernt wurden
-            for date_str in existing_shifts:
-                if date_str not in shifts and not ShiftRequest.query.filter_by(user_id=user.id, date=datetime.fromisoformat(date_str).date(), confirmed=True).first():
-                    has_changes = True
-                    break
+            # Ã„nderungserkennung per Mengen-Arithmetik statt Schleifen:
+            # neue Dienste, geÃ¤nderte Schichttypen oder entfernte (nicht
+            # bestÃ¤tigte) Dienste
+            new_keys = shifts.keys()
+            old_keys = existing_shifts.keys()
+            has_changes = (
+                bool(new_keys - old_keys)
+                or any(existing_shifts[k] != shifts[k] for k in new_keys & old_keys)
+                or bool(old_keys - new_keys - confirmed_dates)
+            )
         
-        # LÃ¶sche alle nicht-bestÃ¤tigten DienstwÃ¼nsche des Users
-        ShiftRequest.query.filter_by(user_id=user.id, confirmed=False).delete()
+        # LÃ¶sche alle nicht-bestÃ¤tigten DienstwÃ¼nsche des Users als bloÃŸes
+        # DELETE ohne Identity-Map-Abgleich (wir committen direkt danach)
+        ShiftRequest.query.filter_by(user_id=user.id, confirmed=False).delete(synchronize_session=False)
         
-        # Erstelle neue DienstwÃ¼nsche
-        new_shifts = []
+        # Erstelle neue DienstwÃ¼nsche als einen Multi-Row-INSERT statt
+        # einem ORM-Flush pro Zeile
+        shift_rows = []
         for date_str, shift_type in shifts.items():
             # Ãœberspringe wenn bereits bestÃ¤tigt
-            if ShiftRequest.query.filter_by(user_id=user.id, date=datetime.fromisoformat(date_str).date(), confirmed=True).first():
+            if date_str in confirmed_dates:
                 continue
-            
-            new_shift = ShiftRequest(
-                user_id=user.id,
-                date=datetime.fromisoformat(date_str).date(),
-                shift_type=shift_type,
-                status='PENDING'
-            )
-            db.session.add(new_shift)
-            new_shifts.append(new_shift)
-        
+
+            shift_rows.append({
+                'user_id': user.id,
+                'date': parsed_dates[date_str],
+                'shift_type': shift_type,
+                'status': 'PENDING'
+            })
+        if shift_rows:
+            db.session.execute(ShiftRequest.__table__.insert(), shift_rows)
+
         # Bei erster Einreichung: Setze Zeitstempel und erstelle Snapshots
         if is_first_submission:
             user.first_submission_at = datetime.now()
-            
-            # Erstelle Snapshots der ursprÃ¼nglichen Dienste
-            for date_str, shift_type in shifts.items():
-                snapshot = ShiftRequestSnapshot(
-                    user_id=user.id,
-                    date=datetime.fromisoformat(date_str).date(),
-                    shift_type=shift_type
-                )
-                db.session.add(snapshot)
-        
+
+            # Erstelle Snapshots der ursprÃ¼nglichen Dienste (ebenfalls gebÃ¼ndelt)
+            snapshot_rows = [{
+                'user_id': user.id,
+                'date': parsed_dates[date_str],
+                'shift_type': shift_type
+            } for date_str, shift_type in shifts.items()]
+            if snapshot_rows:
+                db.session.execute(ShiftRequestSnapshot.__table__.insert(), snapshot_rows)
+
         db.session.commit()
+        invalidate_dashboard_cache()
         
         return jsonify({
             'success': True,
             'is_modification': not is_first_submission and has_changes,
-            'shift_count': len(new_shifts)
+            'shift_count': len(shift_rows)
         })
     
     except Exception as e:
@@ -1355,29 +1865,28 @@ def save_shifts_batch():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/shift-requests/<request_id>', methods=['DELETE'])
+@login_required
 def delete_shift_request(request_id):
     """LÃ¶sche einen Dienstwunsch"""
-    auth_error = require_login()
-    if auth_error:
-        return auth_error
-    
     try:
         user = get_current_user()
-        
-        # Finde den Wunsch
-        shift_request = ShiftRequest.query.get(int(request_id))
-        
-        if not shift_request:
-            return jsonify({'success': False, 'error': 'Wunsch nicht gefunden'}), 404
-        
-        # PrÃ¼fe ob der Wunsch dem aktuellen Benutzer gehÃ¶rt
-        if shift_request.user_id != user.id:
-            return jsonify({'success': False, 'error': 'Nicht autorisiert'}), 403
-        
-        # LÃ¶sche den Wunsch
-        db.session.delete(shift_request)
+
+        try:
+            request_id = int(request_id)
+        except ValueError:
+            return jsonify({'success': False, 'error': 'UngÃ¼ltige ID'}), 400
+
+        # LÃ¶sche den Wunsch in einem einzigen DELETE; die Eigentums-PrÃ¼fung
+        # steckt in der WHERE-Klausel (ein Roundtrip, kein Race)
+        deleted = ShiftRequest.query.filter_by(
+            id=request_id, user_id=user.id
+        ).delete(synchronize_session=False)
         db.session.commit()
-        
+        invalidate_dashboard_cache()
+
+        if not deleted:
+            return jsonify({'success': False, 'error': 'Wunsch nicht gefunden'}), 404
+
         return jsonify({'success': True})
     
     except Exception as e:
@@ -1385,22 +1894,12 @@ def delete_shift_request(request_id):
         return jsonify({'success': False, 'error': str(e)}), 500
 
 # Automatische Datenbank-Initialisierung beim Import (wichtig fÃ¼r Gunicorn/Render)
-try:
-    with app.app_context():
-        db.create_all()
-        migrate_database()
-        # Initial-Admin erstellen falls DB leer
-        if User.query.count() == 0:
-            admin = User(
-                name='GroÃŸ',
-                password=hash_password('mettwurst'),
-                is_admin=True
-            )
-            db.session.add(admin)
-            db.session.commit()
-            print("âœ“ Initial-Admin 'GroÃŸ' erstellt")
-except Exception as e:
-    print(f"âš ï¸ Warnung bei DB-Initialisierung: {e}")
+# Mit SKIP_DB_INIT=1 Ã¼berspringbar, z.B. wenn die Migration im Deploy-Schritt laeuft
+if not os.environ.get('SKIP_DB_INIT'):
+    try:
+        init_db()
+    except Exception as e:
+        print(f"âš ï¸ Warnung bei DB-Initialisierung: {e}")
 
 if __name__ == '__main__':
     init_db()
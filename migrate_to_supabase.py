@@ -0,0 +1,348 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Migration der lokalen SQLite-Datenbank nach Supabase (PostgreSQL).
+
+Liest alle Tabellen aus instance/dienstwuensche.db und lädt sie per
+COPY FROM STDIN in die Ziel-Datenbank aus DATABASE_URL. COPY streamt
+alle Zeilen einer Tabelle in einem einzigen Roundtrip statt einem
+INSERT (Parse + Plan + Netzwerk) pro Zeile — bei der Supabase-Latenz
+ist das der Unterschied zwischen Sekunden und Minuten.
+
+Verwendung:
+    DATABASE_URL=postgresql://... python migrate_to_supabase.py
+"""
+
+import csv
+import hashlib
+import io
+import os
+import sys
+import sqlite3
+
+import psycopg2
+from psycopg2 import sql
+from psycopg2.extras import execute_values
+
+SQLITE_DB = os.path.join(os.path.dirname(__file__), 'instance', 'dienstwuensche.db')
+DATABASE_URL = os.environ.get('DATABASE_URL', '')
+
+# Reihenfolge beachten: Fremdschlüssel zeigen jeweils auf weiter oben
+# stehende Tabellen
+TABLES = [
+    ('users', ('id', 'name', 'email', 'password', 'is_admin',
+               'force_password_change', 'created_at', 'updated_at',
+               'first_submission_at')),
+    ('shift_requests', ('id', 'user_id', 'date', 'shift_type', 'remarks',
+                        'status', 'confirmed', 'created_at', 'updated_at')),
+    ('shift_request_snapshots', ('id', 'user_id', 'date', 'shift_type',
+                                 'created_at')),
+    ('shift_notes', ('id', 'shift_request_id', 'user_id', 'content',
+                     'created_at')),
+    ('messages', ('id', 'user_id', 'content', 'created_at')),
+    ('message_reads', ('id', 'message_id', 'admin_id', 'read_at')),
+]
+
+# SQLite speichert Booleans als 0/1-Integer; PostgreSQL castet Integer
+# nicht implizit nach boolean. Der COPY-Pfad ist davon unberührt (CSV-Text
+# '0'/'1' ist gültiger boolean-Input), der INSERT-Fallback konvertiert.
+BOOLEAN_COLUMNS = {
+    'users': {'is_admin', 'force_password_change'},
+    'shift_requests': {'confirmed'},
+}
+
+# NULL-Defaults direkt im SELECT auffüllen — SQLite rechnet das in C,
+# statt Python-Konditionale pro Zeile
+SELECT_OVERRIDES = {
+    'shift_requests': {
+        'remarks': "COALESCE(remarks, '')",
+        'status': "COALESCE(status, 'PENDING')",
+        'confirmed': "COALESCE(confirmed, 0)",
+        'updated_at': "COALESCE(updated_at, created_at)",
+    },
+}
+
+
+def prepare_schema(pg_cur):
+    """Erstelle bzw. leere das Zielschema
+
+    Ein Fingerprint der SQLAlchemy-Modelle wird in _migration_meta
+    abgelegt; stimmt er beim Re-Run noch, reicht ein TRUNCATE ...
+    RESTART IDENTITY CASCADE (Indizes und Constraints bleiben stehen)
+    statt des teuren drop_all/create_all.
+
+    Der App-Import zieht Engine, Routen und JSON-Provider hoch — er
+    passiert deshalb nur hier und entfällt mit SKIP_SCHEMA_CREATE=1
+    komplett (z.B. wenn das Schema schon per Deploy gepflegt wird).
+    """
+    if os.environ.get('SKIP_SCHEMA_CREATE') == '1':
+        print("   ⚠️ SKIP_SCHEMA_CREATE=1 — Schema wird nicht neu erstellt")
+        return
+    os.environ.setdefault('SKIP_DB_INIT', '1')
+    from app import app, db
+
+    fingerprint = hashlib.sha256(repr(sorted(
+        (t.name, tuple((c.name, str(c.type)) for c in t.columns))
+        for t in db.metadata.tables.values()
+    )).encode()).hexdigest()
+
+    pg_cur.execute(
+        "CREATE TABLE IF NOT EXISTS _migration_meta (key TEXT PRIMARY KEY, value TEXT)"
+    )
+    pg_cur.execute("SELECT value FROM _migration_meta WHERE key = 'schema_hash'")
+    row = pg_cur.fetchone()
+    if row and row[0] == fingerprint:
+        pg_cur.execute(
+            f"TRUNCATE {', '.join(table for table, _ in TABLES)} "
+            f"RESTART IDENTITY CASCADE"
+        )
+        pg_cur.connection.commit()
+        print("   ✓ Schema unverändert — Tabellen nur geleert")
+        return
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    pg_cur.execute(
+        "INSERT INTO _migration_meta (key, value) VALUES ('schema_hash', %s) "
+        "ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value",
+        (fingerprint,)
+    )
+    pg_cur.connection.commit()
+    print("   ✓ Schema erstellt (drop_all + create_all)")
+
+
+# Zeilen pro Flush: hält den Speicher bei O(Batch) statt O(Tabelle)
+BATCH_SIZE = 5000
+
+
+def migrate_table(sqlite_cur, pg_cur, table, columns, use_copy, allow_fallback):
+    """Streame eine Tabelle in Batches nach PostgreSQL; liefert (Zeilen, use_copy)"""
+    overrides = SELECT_OVERRIDES.get(table, {})
+    select_list = ', '.join(overrides.get(column, column) for column in columns)
+    sqlite_cur.execute(f"SELECT {select_list} FROM {table}")
+
+    count = 0
+    max_id = 0
+    while True:
+        rows = sqlite_cur.fetchmany(BATCH_SIZE)
+        if not rows:
+            break
+
+        # Maximum der IDs gleich beim Laden mitführen (Spalte 0 ist in
+        # allen Tabellen die id) — spart den MAX(id)-Scan fürs setval
+        max_id = max(max_id, max(row[0] for row in rows))
+
+        if use_copy:
+            try:
+                copy_rows(pg_cur, table, columns, rows)
+            except psycopg2.Error:
+                if count or not allow_fallback:
+                    # Nur ganz am Anfang wechselbar: der Rollback würde
+                    # bereits geladene Batches/Tabellen verwerfen
+                    raise
+                pg_cur.connection.rollback()
+                use_copy = False
+                print("   ⚠️ COPY nicht möglich, weiter mit Batch-INSERTs")
+        if not use_copy:
+            insert_rows(pg_cur, table, columns, rows)
+
+        count += len(rows)
+    return count, max_id, use_copy
+
+
+# Ein Puffer für alle COPY-Batches: seek+truncate statt neuem StringIO
+# pro Flush hält die Allokation über die ganze Migration hinweg warm
+_copy_buf = io.StringIO()
+_copy_writer = csv.writer(_copy_buf, delimiter='\t', lineterminator='\n',
+                          quoting=csv.QUOTE_MINIMAL)
+
+
+def copy_rows(pg_cur, table, columns, rows):
+    """Lade Zeilen per COPY FROM STDIN in die Ziel-Datenbank"""
+    # Tab-getrenntes CSV in den Puffer schreiben; csv.writer kümmert
+    # sich um eingebettete Tabs/Zeilenumbrüche in remarks/content
+    _copy_buf.seek(0)
+    _copy_buf.truncate()
+    for row in rows:
+        _copy_writer.writerow(['\\N' if value is None else value for value in row])
+    _copy_buf.seek(0)
+
+    pg_cur.copy_expert(
+        sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT csv, DELIMITER E'\\t', NULL '\\N')").format(
+            sql.Identifier(table),
+            sql.SQL(', ').join(map(sql.Identifier, columns))
+        ),
+        _copy_buf
+    )
+
+
+def insert_rows(pg_cur, table, columns, rows):
+    """Fallback ohne COPY: ein Multi-Row-INSERT pro 500 Zeilen
+
+    500 statt 1000 pro Page hält das VALUES-Literal auch bei langen
+    remarks/content-Texten unter den Query-Größen-Limits des
+    Supabase-Poolers; Durchsatz ist ab ein paar hundert Zeilen pro
+    Roundtrip ohnehin gesättigt.
+    """
+    bool_idx = {i for i, column in enumerate(columns)
+                if column in BOOLEAN_COLUMNS.get(table, ())}
+    if bool_idx:
+        rows = [tuple(bool(value) if i in bool_idx and value is not None else value
+                      for i, value in enumerate(row))
+                for row in rows]
+    execute_values(
+        pg_cur,
+        sql.SQL("INSERT INTO {} ({}) VALUES %s").format(
+            sql.Identifier(table),
+            sql.SQL(', ').join(map(sql.Identifier, columns))
+        ),
+        rows,
+        page_size=500
+    )
+
+
+def drop_load_obstacles(pg_cur):
+    """Entferne Fremdschlüssel und Nicht-PK-Indizes vor dem Massen-Laden
+
+    Jede Zeile zahlt sonst Index-Pflege und FK-Prüfung beim INSERT/COPY;
+    einmaliges Neu-Bauen nach dem Laden ist ein einzelner Bulk-Sort.
+    Liefert die DDL-Statements zum Wiederherstellen.
+    """
+    tables = tuple(table for table, _ in TABLES)
+    restore = []
+
+    # Fremdschlüssel zuerst (sie hängen an den Indizes der Zieltabellen)
+    pg_cur.execute("""
+        SELECT conrelid::regclass::text, conname, pg_get_constraintdef(oid)
+        FROM pg_constraint
+        WHERE contype = 'f' AND conrelid::regclass::text IN %s
+    """, (tables,))
+    for table, name, ddl in pg_cur.fetchall():
+        pg_cur.execute(f'ALTER TABLE {table} DROP CONSTRAINT "{name}"')
+        restore.append(f'ALTER TABLE {table} ADD CONSTRAINT "{name}" {ddl}')
+
+    # Alle Indizes, die nicht hinter einem Constraint (PK/UNIQUE) stehen
+    pg_cur.execute("""
+        SELECT i.indexname, i.indexdef
+        FROM pg_indexes i
+        WHERE i.schemaname = 'public' AND i.tablename IN %s
+          AND NOT EXISTS (
+              SELECT 1 FROM pg_constraint c
+              WHERE c.conindid = (quote_ident(i.schemaname) || '.' ||
+                                  quote_ident(i.indexname))::regclass
+          )
+    """, (tables,))
+    for name, ddl in pg_cur.fetchall():
+        pg_cur.execute(f'DROP INDEX "{name}"')
+        restore.append(ddl)
+
+    return restore
+
+
+def reset_sequences(pg_cur, max_ids):
+    """Setze alle Auto-Increment-Sequenzen in einem einzigen Roundtrip
+
+    Die Maxima stammen direkt aus dem Lade-Durchlauf — kein erneuter
+    Scan pro Tabelle auf der Zielseite. setval ist strict: fehlt eine
+    Sequenz (pg_get_serial_sequence liefert NULL), wird die Zeile
+    schlicht NULL statt zu scheitern.
+    """
+    statement = sql.SQL(" UNION ALL ").join(
+        sql.SQL(
+            "SELECT setval(pg_get_serial_sequence({name}, 'id'), {value})"
+        ).format(name=sql.Literal(table),
+                 value=sql.Literal(max(max_ids.get(table, 1), 1)))
+        for table, _ in TABLES
+    )
+    pg_cur.execute(statement)
+
+
+def migrate():
+    """Führt die Migration durch"""
+    if not DATABASE_URL:
+        print("❌ DATABASE_URL ist nicht gesetzt (Supabase-Verbindungsstring)")
+        sys.exit(1)
+    if not os.path.exists(SQLITE_DB):
+        print(f"❌ SQLite-Datenbank nicht gefunden: {SQLITE_DB}")
+        sys.exit(1)
+
+    print("🔄 Starte Migration nach Supabase...")
+
+    sqlite_conn = sqlite3.connect(SQLITE_DB)
+    sqlite_cur = sqlite_conn.cursor()
+    # Wir lesen nur: Journal/Sync aus, großzügiger Page-Cache, damit die
+    # sequentiellen Scans mit dem COPY-Konsumenten Schritt halten
+    sqlite_cur.execute("PRAGMA journal_mode=OFF")
+    sqlite_cur.execute("PRAGMA synchronous=OFF")
+    sqlite_cur.execute("PRAGMA cache_size=-262144")  # 256 MB
+    sqlite_cur.execute("PRAGMA temp_store=MEMORY")
+    sqlite_cur.arraysize = BATCH_SIZE
+
+    # Welche Tabellen gibt es in der lokalen Datenbank überhaupt?
+    # (Ältere Stände haben z.B. noch keine messages-Tabelle.) Ein
+    # sqlite_master-Lookup statt try/except pro Tabelle.
+    existing_tables = {row[0] for row in sqlite_cur.execute(
+        "SELECT name FROM sqlite_master WHERE type='table'")}
+    # Keepalives, damit der Supabase-Pooler die Verbindung nicht mitten
+    # im COPY-Stream kappt; Timeouts aus, die Migration darf dauern
+    pg_conn = psycopg2.connect(
+        DATABASE_URL,
+        keepalives=1,
+        keepalives_idle=30,
+        keepalives_interval=10,
+        keepalives_count=3,
+        options='-c statement_timeout=0 -c idle_in_transaction_session_timeout=0'
+    )
+    pg_cur = pg_conn.cursor()
+
+    prepare_schema(pg_cur)
+
+    # COPY ist der schnelle Pfad; manche Pooler (pgbouncer im
+    # Transaction-Modus) verbieten es — dann Multi-Row-INSERTs
+    use_copy = os.environ.get('USE_COPY', '1') != '0'
+
+    restore_ddl = drop_load_obstacles(pg_cur)
+    pg_conn.commit()
+
+    # Die gesamte Datenlast läuft in einer Transaktion: ein Commit/fsync
+    # statt vier, und ein Abbruch hinterlässt keine halbe Migration.
+    # synchronous_commit=off ist hier gratis — bei einem Crash wird die
+    # idempotente Migration ohnehin komplett wiederholt.
+    pg_cur.execute("SET synchronous_commit = off")
+
+    try:
+        total = 0
+        max_ids = {}
+        for table, columns in TABLES:
+            if table not in existing_tables:
+                print(f"   ⚠️ Tabelle {table} existiert in SQLite nicht — übersprungen")
+                continue
+
+            count, max_ids[table], use_copy = migrate_table(
+                sqlite_cur, pg_cur, table, columns, use_copy,
+                allow_fallback=(total == 0))
+            print(f"   ✓ {table}: {count} Zeilen")
+            total += count
+
+        reset_sequences(pg_cur, max_ids)
+        pg_conn.commit()
+        print(f"✅ Migration abgeschlossen: {total} Zeilen insgesamt")
+    except Exception as e:
+        pg_conn.rollback()
+        print(f"❌ Fehler bei der Migration: {e}")
+        sys.exit(1)
+    finally:
+        # Indizes und Fremdschlüssel auch nach einem Fehler wiederherstellen
+        try:
+            for ddl in restore_ddl:
+                pg_cur.execute(ddl)
+            pg_conn.commit()
+        except Exception as e:
+            print(f"⚠️ Indizes/Constraints konnten nicht wiederhergestellt werden: {e}")
+        sqlite_conn.close()
+        pg_conn.close()
+
+
+if __name__ == '__main__':
+    migrate()